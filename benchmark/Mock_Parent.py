@@ -0,0 +1,93 @@
+import json
+import time
+import random
+import threading
+
+API_URL = 'http://api.smitegame.com/smiteapi.svc'
+
+
+class MockParent(object):
+    """
+    Offline stand-in for the Streamlabs Chatbot Parent object. GetRequest serves recorded Hi-Rez responses from a
+    fixture dictionary (method name -> response) with a configurable latency and error rate, messages and logs are
+    recorded instead of being sent.
+    """
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, moderators=()):
+        """
+        :param fixtures: Dictionary from API method name (e.g. 'getplayer') to the response to serve
+        :param latency: Seconds every GetRequest takes
+        :param jitter: Maximum number of seconds randomly added to the latency
+        :param error_rate: Fraction of GetRequest calls that fail with a 503
+        :param seed: (optional) Random seed, for reproducible runs
+        :param moderators: Users HasPermission reports as moderators
+        """
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.moderators = set(moderators)
+        self.lock = threading.Lock()
+        self.calls = []
+        self.messages = []
+        self.logs = []
+
+    @staticmethod
+    def load_fixtures(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    @staticmethod
+    def get_method(url):
+        method = url[len(API_URL):].strip('/').split('/')[0]
+        return method[:-len('json')] if method.endswith('json') else method
+
+    def GetRequest(self, url, headers):
+        method = MockParent.get_method(url)
+        with self.lock:
+            self.calls.append(method)
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return json.dumps({'status': 503, 'error': 'Service Unavailable'})
+        response = self.fixtures.get(method, {'ret_msg': 'Unknown method ' + method})
+        return json.dumps({'status': 200, 'response': json.dumps(response)})
+
+    def SendStreamMessage(self, message):
+        with self.lock:
+            self.messages.append((time.time(), message))
+
+    def HasPermission(self, user, permission, info):
+        return user in self.moderators
+
+    def Log(self, script_name, message):
+        with self.lock:
+            self.logs.append((time.time(), script_name, message))
+
+    def call_counts(self):
+        counts = {}
+        with self.lock:
+            for method in self.calls:
+                counts[method] = counts.get(method, 0) + 1
+        return counts
+
+
+class MockChatMessage(object):
+    """
+    Minimal stand-in for the data object passed to Execute().
+    """
+    def __init__(self, message, user='viewer'):
+        self.Message = message
+        self.User = user
+        self.UserName = user
+
+    def IsChatMessage(self):
+        return True
+
+    def IsFromTwitch(self):
+        return True
+
+    def IsWhisper(self):
+        return False
@@ -0,0 +1,201 @@
+"""
+Offline benchmark of the chatbot script. Replays a synthetic burst of chat commands through Execute()/Tick() against
+a MockParent serving recorded Hi-Rez responses and reports command latency, upstream calls and quota consumed.
+
+Usage: python Run_Benchmark.py --commands 500 --rate 50 --latency 0.2 --error-rate 0.01
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import bisect
+import shutil
+import tempfile
+import argparse
+
+from Mock_Parent import MockParent
+from Mock_Parent import MockChatMessage
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), 'chatbot-smite-api')
+FIXTURES_FILE = os.path.join(BENCHMARK_DIR, 'fixtures', 'hirez.json')
+
+COMMAND_MIX = [('!duelrank {player}', 5), ('!godrank {player} {god}', 4), ('!quota', 1)]
+GODS = ['ra', 'amaterasu', 'ama', 'thor', 'loki', 'ah puch', 'ne zha', 'anubis', 'zeus', 'chang\'e']
+
+
+def percentile(values, fraction):
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def weighted_choice(rng, choices):
+    cumulative = []
+    total = 0
+    for _, weight in choices:
+        total += weight
+        cumulative.append(total)
+    return choices[bisect.bisect_right(cumulative, rng.random() * total)][0]
+
+
+def make_burst(count, players, seed):
+    """
+    Builds a list of chat messages where a few popular players are queried far more often than the rest.
+    """
+    rng = random.Random(seed)
+    player_weights = [('player{0}'.format(i), 1.0 / (i + 1)) for i in range(players)]
+    burst = []
+    for _ in range(count):
+        template = weighted_choice(rng, COMMAND_MIX)
+        burst.append(template.format(player=weighted_choice(rng, player_weights), god=rng.choice(GODS)))
+    return burst
+
+
+def load_script(args):
+    """
+    Imports a copy of the chatbot script from a temporary directory, so settings and cached data of the real
+    installation are neither used nor modified.
+    """
+    work_dir = tempfile.mkdtemp(prefix='smite-benchmark-')
+    script_dir = os.path.join(work_dir, 'chatbot-smite-api')
+    shutil.copytree(SCRIPT_DIR, script_dir, ignore=shutil.ignore_patterns('Settings', 'Cache', '*.pyc'))
+    os.makedirs(os.path.join(script_dir, 'Settings'))
+    with open(os.path.join(script_dir, 'Settings', 'settings.json'), 'w') as f:
+        json.dump({'DevId': '1000', 'AuthKey': 'MOCKAUTHKEY', 'WorkerCount': args.workers,
+                   'MaxQueuedCommands': args.queue_size, 'UserCooldown': args.user_cooldown,
+                   'GlobalCooldown': args.global_cooldown, 'ReplyCacheDuration': args.reply_cache}, f)
+
+    # The script expects to run inside IronPython, where clr is always available
+    if 'clr' not in sys.modules:
+        clr = types.ModuleType('clr')
+        clr.AddReference = lambda name: None
+        sys.modules['clr'] = clr
+    sys.path.insert(0, script_dir)
+    import Smite_StreamlabsSystem
+    return Smite_StreamlabsSystem, work_dir
+
+
+def run(args):
+    script, work_dir = load_script(args)
+    parent = MockParent(MockParent.load_fixtures(args.fixtures), args.latency, args.jitter, args.error_rate, args.seed)
+    script.Parent = parent
+    script.Init()
+
+    # The script falls back to its defaults when the settings file cannot be read, which would silently ignore the
+    # command line options
+    expected = {'DevId': '1000', 'WorkerCount': args.workers, 'MaxQueuedCommands': args.queue_size,
+                'UserCooldown': args.user_cooldown, 'GlobalCooldown': args.global_cooldown,
+                'ReplyCacheDuration': args.reply_cache}
+    for name, value in expected.items():
+        if getattr(script.ScriptSettings, name) != value:
+            raise RuntimeError('Setting {0} was not loaded (expected {1}, got {2})'.format(
+                name, value, getattr(script.ScriptSettings, name)))
+
+    # Record when every command was submitted to the workers and when its reply became ready
+    reply_latencies = []
+    accepted = []
+    submit = script.Workers.submit
+
+    def timed_submit(job, *job_args):
+        if job is not script.RunCommand:
+            return submit(job, *job_args)
+        submitted = time.time()
+
+        def timed_job():
+            try:
+                return job(*job_args)
+            finally:
+                reply_latencies.append(time.time() - submitted)
+        if not submit(timed_job):
+            return False
+        accepted.append(submitted)
+        return True
+    script.Workers.submit = timed_submit
+
+    burst = make_burst(args.commands, args.players, args.seed)
+    execute_latencies = []
+    start = time.time()
+    for i, message in enumerate(burst):
+        while time.time() < start + float(i) / args.rate:
+            script.Tick()
+            time.sleep(0.0005)
+        executed = time.time()
+        script.Execute(MockChatMessage(message, 'viewer{0}'.format(i)))
+        execute_latencies.append(time.time() - executed)
+
+    deadline = time.time() + args.timeout
+    while len(reply_latencies) < len(accepted) and time.time() < deadline:
+        script.Tick()
+        time.sleep(0.0005)
+    script.Tick()
+    elapsed = time.time() - start
+    script.Unload()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    calls = parent.call_counts()
+    upstream = sum(calls.values())
+    quota = script.SmiteApi.quota.stats()
+    return {
+        'commands': len(burst),
+        'replies': len(parent.messages),
+        'not_queued': len([message for message in burst if not message.startswith('!quota')]) - len(accepted),
+        'elapsed_s': elapsed,
+        'execute_p50_ms': percentile(execute_latencies, 0.5) * 1000,
+        'execute_p99_ms': percentile(execute_latencies, 0.99) * 1000,
+        'reply_p50_ms': percentile(reply_latencies, 0.5) * 1000,
+        'reply_p99_ms': percentile(reply_latencies, 0.99) * 1000,
+        'upstream_calls': upstream,
+        'upstream_calls_per_command': float(upstream) / max(1, len(burst)),
+        'upstream_calls_by_method': calls,
+        'quota_consumed': quota['requests_today'],
+        'cache': script.SmiteApi.cache.stats()
+    }
+
+
+def print_report(report):
+    print('commands             {0}'.format(report['commands']))
+    print('replies              {0}'.format(report['replies']))
+    print('not queued           {0} (cooldown, reply cache or full queue)'.format(report['not_queued']))
+    print('elapsed              {0:.2f} s'.format(report['elapsed_s']))
+    print('Execute() p50/p99    {0:.3f} / {1:.3f} ms'.format(report['execute_p50_ms'], report['execute_p99_ms']))
+    print('reply p50/p99        {0:.1f} / {1:.1f} ms'.format(report['reply_p50_ms'], report['reply_p99_ms']))
+    print('upstream calls       {0} ({1:.3f} per command)'.format(report['upstream_calls'],
+                                                                 report['upstream_calls_per_command']))
+    for method, count in sorted(report['upstream_calls_by_method'].items()):
+        print('    {0:<20}{1}'.format(method, count))
+    print('quota consumed       {0}'.format(report['quota_consumed']))
+    print('cache hits/misses    {0} / {1}'.format(report['cache']['hits'], report['cache']['misses']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays a synthetic chat burst through the chatbot script offline.')
+    parser.add_argument('--commands', type=int, default=500, help='number of chat commands in the burst')
+    parser.add_argument('--rate', type=float, default=50.0, help='chat commands per second')
+    parser.add_argument('--players', type=int, default=20, help='number of distinct players queried')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds every upstream request takes')
+    parser.add_argument('--jitter', type=float, default=0.1, help='maximum random seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream requests failing')
+    parser.add_argument('--workers', type=int, default=2, help='worker threads of the script')
+    parser.add_argument('--queue-size', type=int, default=1000, help='maximum queued commands of the script')
+    parser.add_argument('--user-cooldown', type=int, default=10, help='per-user command cooldown in seconds')
+    parser.add_argument('--global-cooldown', type=int, default=0, help='global command cooldown in seconds')
+    parser.add_argument('--reply-cache', type=int, default=30, help='seconds replies are reused for identical commands')
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for outstanding replies')
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the burst and the mock')
+    parser.add_argument('--fixtures', default=FIXTURES_FILE, help='JSON file of recorded Hi-Rez responses')
+    parser.add_argument('--output', help='also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import time
+import threading
+
+# Identical queries repeated within this many seconds of the reply being sent are ignored, chat just saw the answer
+REPEAT_SUPPRESS_SECONDS = 5
+PRUNE_SIZE = 1000
+
+
+class CommandCooldowns(object):
+    """
+    Per-user and global cooldowns of chat commands.
+    """
+    def __init__(self, user_cooldown=10, global_cooldown=1, clock=time.time):
+        self.user_cooldown = user_cooldown
+        self.global_cooldown = global_cooldown
+        self.clock = clock
+        self.user_until = {}
+        self.global_until = {}
+
+    def set_durations(self, user_cooldown, global_cooldown):
+        self.user_cooldown = user_cooldown
+        self.global_cooldown = global_cooldown
+
+    def is_user_on_cooldown(self, command, user):
+        return self.user_until.get((command, user), 0) > self.clock()
+
+    def is_global_on_cooldown(self, command):
+        return self.global_until.get(command, 0) > self.clock()
+
+    def add_user_cooldown(self, command, user):
+        now = self.clock()
+        if len(self.user_until) > PRUNE_SIZE:
+            self.user_until = dict((key, until) for key, until in self.user_until.items() if until > now)
+        self.user_until[(command, user)] = now + self.user_cooldown
+
+    def add_global_cooldown(self, command):
+        self.global_until[command] = self.clock() + self.global_cooldown
+
+
+class ReplyCache(object):
+    """
+    Short-lived cache of formatted replies keyed on the normalised command, so repeated identical queries are
+    answered without touching the Smite API.
+    """
+    def __init__(self, duration=30, clock=time.time):
+        self.duration = duration
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.replies = {}
+
+    @staticmethod
+    def make_key(words):
+        return ' '.join(word for word in words if word)
+
+    def get(self, key):
+        """
+        :return: Tuple (reply or None, True if the reply was sent so recently that it should not be repeated)
+        """
+        with self.lock:
+            entry = self.replies.get(key)
+            if entry is None:
+                return None, False
+            now = self.clock()
+            if now - entry[1] >= self.duration:
+                del self.replies[key]
+                return None, False
+            return entry[0], now - entry[1] < REPEAT_SUPPRESS_SECONDS
+
+    def put(self, key, reply):
+        if self.duration <= 0:
+            return
+        with self.lock:
+            now = self.clock()
+            if len(self.replies) > PRUNE_SIZE:
+                self.replies = dict((k, entry) for k, entry in self.replies.items() if now - entry[1] < self.duration)
+            self.replies[key] = (reply, now)
@@ -6,12 +6,46 @@ class MySettings(object):
 	def __init__(self, settings_file=None):
 		try:
 			with codecs.open(settings_file, encoding="utf-8-sig", mode="r") as f:
-				saved_settings = json.load(f, encoding="utf-8")
+				saved_settings = json.load(f)
 			self.reload(saved_settings)
 		except:
 			self.DevId = ''
 			self.AuthKey = ''
+			self.WorkerCount = 2
+			self.MaxQueuedCommands = 20
+			self.DailyQueryBudget = 7500
+			self.QueriesPerMinute = 120
+			self.MetricsDumpInterval = 300
+			self.StreamerName = 'Enchom'
+			self.PlayerRefreshInterval = 110
+			self.GodRanksRefreshInterval = 110
+			self.StatusRefreshInterval = 30
+			self.UserCooldown = 10
+			self.GlobalCooldown = 1
+			self.ReplyCacheDuration = 30
+			self.LeaderboardRefreshInterval = 1800
+			self.LeaderboardTier = 27
+			self.LeaderboardRound = 1
+			self.TrackedPlayers = ''
+			self.AnnounceMatches = False
 
 	def reload(self, json_data):
 		self.DevId = json_data['DevId']
-		self.AuthKey = json_data['AuthKey']
\ No newline at end of file
+		self.AuthKey = json_data['AuthKey']
+		self.WorkerCount = int(json_data.get('WorkerCount', 2))
+		self.MaxQueuedCommands = int(json_data.get('MaxQueuedCommands', 20))
+		self.DailyQueryBudget = int(json_data.get('DailyQueryBudget', 7500))
+		self.QueriesPerMinute = int(json_data.get('QueriesPerMinute', 120))
+		self.MetricsDumpInterval = int(json_data.get('MetricsDumpInterval', 300))
+		self.StreamerName = json_data.get('StreamerName', 'Enchom')
+		self.PlayerRefreshInterval = int(json_data.get('PlayerRefreshInterval', 110))
+		self.GodRanksRefreshInterval = int(json_data.get('GodRanksRefreshInterval', 110))
+		self.StatusRefreshInterval = int(json_data.get('StatusRefreshInterval', 30))
+		self.UserCooldown = int(json_data.get('UserCooldown', 10))
+		self.GlobalCooldown = int(json_data.get('GlobalCooldown', 1))
+		self.ReplyCacheDuration = int(json_data.get('ReplyCacheDuration', 30))
+		self.LeaderboardRefreshInterval = int(json_data.get('LeaderboardRefreshInterval', 1800))
+		self.LeaderboardTier = int(json_data.get('LeaderboardTier', 27))
+		self.LeaderboardRound = int(json_data.get('LeaderboardRound', 1))
+		self.TrackedPlayers = json_data.get('TrackedPlayers', '')
+		self.AnnounceMatches = bool(json_data.get('AnnounceMatches', False))
\ No newline at end of file
@@ -1,12 +1,134 @@
 import os
 import sys
 import json
+import time
 import hashlib
+import bisect
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections import deque
 from datetime import datetime
 
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from Smite_Transport import ParentTransport
+
 API_URL = 'http://api.smitegame.com/smiteapi.svc'
 LANG = '1'
 
+SESSION_LIFETIME = 15 * 60
+SESSION_RENEW_MARGIN = 60
+
+CACHE_MAX_SIZE = 512
+# Expired responses are kept and served for up to this many seconds while the API is unavailable
+STALE_MAX_AGE = 6 * 3600
+# Seconds a response stays valid per API method. Methods without an entry are never cached.
+CACHE_TTLS = {
+    'getgods': 6 * 3600,
+    'getitems': 6 * 3600,
+    'getgodskins': 6 * 3600,
+    'getgodrecommendeditems': 6 * 3600,
+    'getpatchinfo': 3600,
+    'getmotd': 3600,
+    'getplayeridbyname': 3600,
+    'getplayerachievements': 300,
+    'getfriends': 300,
+    'getteamdetails': 600,
+    'getteamplayers': 600,
+    'searchteams': 600,
+    'getgodleaderboard': 600,
+    'getleagueleaderboard': 600,
+    'getesportsproleaguedetails': 600,
+    'getplayer': 120,
+    'getgodranks': 120,
+    'getqueuestats': 120,
+    'getmatchhistory': 60,
+    'gettopmatches': 60,
+    'gethirezserverstatus': 60,
+    'getplayerstatus': 10,
+    'getmatchplayerdetails': 10,
+}
+
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 30
+
+DAILY_REQUEST_LIMIT = 7500
+DAILY_SESSION_LIMIT = 500
+REQUESTS_PER_MINUTE = 120
+QUOTA_SYNC_INTERVAL = 10 * 60
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+# Fraction of the daily budget after which requests of the given priority are refused
+QUOTA_SHED_THRESHOLDS = {
+    PRIORITY_HIGH: 1.0,
+    PRIORITY_NORMAL: 0.95,
+    PRIORITY_LOW: 0.8,
+}
+
+# Methods whose responses only change with a new patch and are therefore persisted on disk.
+STATIC_DATA_METHODS = ('getgods', 'getitems', 'getgodskins', 'getgodrecommendeditems')
+STATIC_DATA_FORMAT = 3
+STATIC_DATA_INDEX = 'index.json'
+PATCH_CHECK_INTERVAL = 6 * 3600
+
+MATCH_BATCH_SIZE = 10
+MATCH_CACHE_SIZE = 1000
+
+# Player name -> (player id, portal) index: names kept (in memory and in the index file), and minimum seconds between
+# two saves of the index file
+PLAYER_INDEX_SIZE = 10000
+PLAYER_INDEX_SAVE_INTERVAL = 300
+PLAYER_INDEX_FORMAT = 1
+# Responses the index is filled from, with the (name, player id, portal id) fields of their rows
+PLAYER_INDEX_FIELDS = {
+    'getplayer': ('Name', 'Id', None),
+    'getfriends': ('name', 'player_id', 'portal_id'),
+    'getmatchdetails': ('playerName', 'playerId', 'playerPortalId'),
+    'getmatchdetailsbatch': ('playerName', 'playerId', 'playerPortalId'),
+    'getmatchhistory': ('playerName', 'playerId', None),
+    'getmatchplayerdetails': ('playerName', 'playerId', 'playerPortalId'),
+    'getleagueleaderboard': ('Name', 'player_id', None),
+    'getgodleaderboard': ('player_name', 'player_id', None),
+}
+
+# Methods whose first parameter is a player name or id. A response requested by name is also cached under the id.
+PLAYER_PARAM_METHODS = ('getplayer', 'getfriends', 'getgodranks', 'getplayerstatus', 'getmatchhistory',
+                        'getqueuestats')
+
+# Maximum number of getplayer requests in flight when resolving a clan or friends list
+PLAYER_FANOUT_CONCURRENCY = 10
+
+METRICS_WINDOW = 500
+# Upper bounds (in milliseconds) of the latency histogram buckets, the last bucket is unbounded
+METRICS_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+METRICS_TIMINGS = ('total', 'signature', 'network', 'decode')
+
+GOD_RANK_INDEX_SIZE = 128
+GOD_SUGGESTIONS = 3
+GOD_SUGGESTION_MIN_SCORE = 0.2
+
+def _normalize_enum_name(name):
+    return ' '.join(str(name).lower().replace('_', ' ').replace('-', ' ').split())
+
+
+def _index_enum(cls, display=lambda attr: attr):
+    """
+    Builds the id->name and name->id lookup tables of an enum class once, at import time.
+    """
+    cls._names = {}
+    cls._ids = {}
+    for attr, attr_val in vars(cls).items():
+        if not attr.startswith('_') and isinstance(attr_val, int):
+            cls._names[attr_val] = display(attr)
+            cls._ids[_normalize_enum_name(attr)] = attr_val
+
+
 class Division:
     Qualifying = 0
     Bronze_V = 1
@@ -39,12 +161,14 @@ class Division:
 
     @staticmethod
     def get_name(div_id):
-        for attr in dir(Division):
-            attr_val = getattr(Division, attr)
-            if isinstance(attr_val, int):
-                if attr_val == div_id:
-                    return attr.replace('_', ' ')
-        return None
+        return Division._names.get(div_id)
+
+    @staticmethod
+    def get_id(name):
+        """
+        Case-insensitive lookup of a division id by name, e.g. "gold iv" or "Gold_IV".
+        """
+        return Division._ids.get(_normalize_enum_name(name))
 
 
 class Portal:
@@ -58,12 +182,14 @@ class Portal:
 
     @staticmethod
     def get_name(div_id):
-        for attr in dir(Portal):
-            attr_val = getattr(Portal, attr)
-            if isinstance(attr_val, int):
-                if attr_val == div_id:
-                    return attr
-        return None
+        return Portal._names.get(div_id)
+
+    @staticmethod
+    def get_id(name):
+        """
+        Case-insensitive lookup of a portal id by name, e.g. "steam" or "Xbox".
+        """
+        return Portal._ids.get(_normalize_enum_name(name))
 
 class Queue:
     ARENA = 435
@@ -111,30 +237,1029 @@ class Queue:
 
     @staticmethod
     def get_name(div_id):
-        for attr in dir(Queue):
-            attr_val = getattr(Queue, attr)
-            if isinstance(attr_val, int):
-                if attr_val == div_id:
-                    return attr
-        return None
-        
+        return Queue._names.get(div_id)
+
+    @staticmethod
+    def get_id(name):
+        """
+        Case-insensitive lookup of a queue id by name, e.g. "joust league" or "duel".
+        """
+        return Queue._ids.get(_normalize_enum_name(name))
+
+
+_index_enum(Division, lambda attr: attr.replace('_', ' '))
+_index_enum(Portal)
+_index_enum(Queue)
+
+
+def _normalize_god_name(name):
+    return ''.join(c for c in name.lower() if c.isalnum())
+
+
+class GodNameIndex(object):
+    """
+    Resolves (possibly partial or misspelled) god names typed in chat. Exact and unique prefix matches are resolved
+    directly, anything else produces suggestions ranked by trigram similarity.
+    """
+    def __init__(self, god_names):
+        self.names = {}
+        self.trigrams = {}
+        self.trigram_counts = {}
+        for name in god_names:
+            key = _normalize_god_name(name)
+            self.names[key] = name
+            trigrams = self._trigrams(key)
+            self.trigram_counts[key] = len(trigrams)
+            for trigram in trigrams:
+                self.trigrams.setdefault(trigram, set()).add(key)
+        self.sorted_keys = sorted(self.names)
+
+    @staticmethod
+    def _trigrams(key):
+        padded = '$$' + key + '$'
+        return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    def resolve(self, query):
+        """
+        :return: Tuple (god name or None, list of suggested god names)
+        """
+        key = _normalize_god_name(query)
+        if not key:
+            return None, []
+        if key in self.names:
+            return self.names[key], []
+
+        matches = self._prefix_matches(key)
+        if len(matches) == 1:
+            return self.names[matches[0]], []
+        if len(matches) > 1:
+            return None, [self.names[match] for match in matches[:GOD_SUGGESTIONS]]
+        return None, self.suggest(key)
+
+    def suggest(self, query):
+        key = _normalize_god_name(query)
+        query_trigrams = self._trigrams(key)
+        shared = {}
+        for trigram in query_trigrams:
+            for match in self.trigrams.get(trigram, ()):
+                shared[match] = shared.get(match, 0) + 1
+        scored = []
+        for match, count in shared.items():
+            # Jaccard similarity of the two trigram sets: shared / (|query| + |candidate| - shared)
+            score = float(count) / (len(query_trigrams) + self.trigram_counts[match] - count)
+            if score >= GOD_SUGGESTION_MIN_SCORE:
+                scored.append((-score, match))
+        scored.sort()
+        return [self.names[match] for _, match in scored[:GOD_SUGGESTIONS]]
+
+    def _prefix_matches(self, key):
+        matches = []
+        for name in self.sorted_keys[bisect.bisect_left(self.sorted_keys, key):]:
+            if not name.startswith(key):
+                break
+            matches.append(name)
+        return matches
+
+
+class SessionManager(object):
+    """
+    Keeps a Hi-Rez session alive for its whole lifetime instead of testing it before every request. A new session
+    is only created when the current one is about to expire or when the API reports it as invalid.
+    """
+    def __init__(self, create_session, lifetime=SESSION_LIFETIME, renew_margin=SESSION_RENEW_MARGIN, clock=time.time):
+        self.create_session = create_session
+        self.lifetime = lifetime
+        self.renew_margin = renew_margin
+        self.clock = clock
+        self.session_id = None
+        self.created_at = None
+        self.renewals = 0
+        self.lock = threading.RLock()
+
+    def get(self):
+        with self.lock:
+            if self.session_id is None or self.is_expiring():
+                self.renew()
+            return self.session_id
+
+    def renew(self):
+        with self.lock:
+            self.session_id = self.create_session()
+            self.created_at = self.clock()
+            self.renewals += 1
+            return self.session_id
+
+    def invalidate(self, session_id=None):
+        """
+        Drops the current session. If session_id is given, the session is only dropped if it is still the current one,
+        so that concurrent failures of the same session only create a single new session.
+        """
+        with self.lock:
+            if session_id is not None and session_id != self.session_id:
+                return
+            self.session_id = None
+            self.created_at = None
+
+    def is_expiring(self):
+        if self.created_at is None:
+            return True
+        return self.clock() - self.created_at >= self.lifetime - self.renew_margin
+
+    @staticmethod
+    def is_invalid_response(response):
+        """
+        Checks whether an API response reports the session used for the request as invalid or expired.
+        """
+        if isinstance(response, list):
+            if len(response) == 0:
+                return False
+            response = response[0]
+        if not isinstance(response, dict):
+            return False
+        ret_msg = response.get('ret_msg')
+        if not ret_msg:
+            return False
+        ret_msg = str(ret_msg).lower()
+        return 'invalid session' in ret_msg or 'session expired' in ret_msg
+
+
+class ResponseCache(object):
+    """
+    Bounded LRU cache of API responses keyed on (method, params), where every method has its own time to live.
+    Cached responses are shared between callers, so they should be treated as read-only.
+    """
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttls=None, clock=time.time):
+        self.max_size = max_size
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_ttl(self, method):
+        return self.ttls.get(method, 0)
+
+    @staticmethod
+    def is_cacheable(response):
+        """
+        Only complete responses are kept: a non-empty list (or a single object) without any row reporting an error in
+        'ret_msg'. Error payloads and empty lists are usually transient and must not outlive the request.
+        """
+        rows = [response] if isinstance(response, dict) else response
+        if not isinstance(rows, list) or len(rows) == 0:
+            return False
+        return not any(isinstance(row, dict) and row.get('ret_msg') for row in rows)
+
+    def get(self, method, params=None):
+        """
+        Returns the cached response or None if there is no fresh entry for the given request.
+        """
+        key = (method, params)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries[key] = entry
+            if entry[0] <= self.clock():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def get_stale(self, method, params=None, max_age=STALE_MAX_AGE):
+        """
+        Returns the last cached response, even if it expired, as a tuple (response, age in seconds). Returns
+        (None, None) if there is no entry or it is older than max_age.
+        """
+        with self.lock:
+            entry = self.entries.get((method, params))
+            if entry is None:
+                return None, None
+            age = self.clock() - entry[2]
+            if age > max_age:
+                return None, None
+            return entry[1], age
+
+    def put(self, method, params, response, ttl=None):
+        if ttl is None:
+            ttl = self.get_ttl(method)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        key = (method, params)
+        with self.lock:
+            self.entries.pop(key, None)
+            now = self.clock()
+            self.entries[key] = (now + ttl, response, now)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def contains(self, method, params=None):
+        """
+        Returns True if there is a fresh entry for the given request, without counting a hit or a miss.
+        """
+        with self.lock:
+            entry = self.entries.get((method, params))
+            return entry is not None and entry[0] > self.clock()
+
+    def invalidate(self, method, params=None):
+        with self.lock:
+            self.entries.pop((method, params), None)
+
+    def invalidate_method(self, method):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == method]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class RateLimitedError(QuotaExceededError):
+    """
+    The per-minute rate is exhausted while the daily budget is not. Batch jobs can wait retry_after seconds and try
+    again, chat commands treat it like any other QuotaExceededError.
+    """
+    def __init__(self, message, retry_after):
+        QuotaExceededError.__init__(self, message)
+        self.retry_after = retry_after
+
+
+class ApiUnavailableError(Exception):
+    pass
+
+
+class SessionRefusedError(ApiUnavailableError):
+    """
+    'createsession' did not approve a session, e.g. because the developer id or auth key is wrong or the daily session
+    cap is reached.
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending requests after a number of consecutive failures. While open, requests fail immediately with
+    ApiUnavailableError. Once the reset timeout has passed, a single caller probes the API and the breaker closes
+    again if the probe succeeds.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, probe, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT,
+                 clock=time.time):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def before_request(self):
+        """
+        :raises ApiUnavailableError: if the breaker is open
+        """
+        with self.lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return
+            if self.probing or self.clock() - self.opened_at < self.reset_timeout:
+                raise ApiUnavailableError('Smite API unavailable')
+            self.probing = True
+
+        try:
+            available = self.probe()
+        except Exception:
+            available = False
+        with self.lock:
+            self.probing = False
+            if available:
+                self.state = CircuitBreaker.CLOSED
+                self.failures = 0
+                return
+            self.opened_at = self.clock()
+        raise ApiUnavailableError('Smite API unavailable')
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.state == CircuitBreaker.CLOSED:
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = self.clock()
+
+
+class QuotaTracker(object):
+    """
+    Local accounting of the Hi-Rez API quota. Every request and session is counted as it is made, the counters are
+    corrected from 'getdataused' from time to time and reset at UTC midnight like the real quota. Requests are limited
+    by a per-minute token bucket and low priority requests are refused well before the daily budget runs out.
+    """
+    def __init__(self, daily_budget=DAILY_REQUEST_LIMIT, per_minute=REQUESTS_PER_MINUTE,
+                 sync_interval=QUOTA_SYNC_INTERVAL, clock=time.time):
+        self.daily_budget = daily_budget
+        self.per_minute = per_minute
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.daily_limit = DAILY_REQUEST_LIMIT
+        self.session_limit = DAILY_SESSION_LIMIT
+        self.day = self._today()
+        self.requests_today = 0
+        self.sessions_today = 0
+        self.shed = 0
+        self.synced_at = None
+        self.tokens = float(per_minute)
+        self.refilled_at = clock()
+
+    def set_limits(self, daily_budget=None, per_minute=None):
+        with self.lock:
+            if daily_budget is not None:
+                self.daily_budget = daily_budget
+            if per_minute is not None:
+                self.per_minute = per_minute
+                self.tokens = min(self.tokens, float(per_minute))
+
+    def budget(self):
+        return min(self.daily_budget, self.daily_limit)
+
+    def remaining(self):
+        with self.lock:
+            self._check_day()
+            return max(0, self.budget() - self.requests_today)
+
+    def acquire(self, priority=PRIORITY_NORMAL, session=False):
+        """
+        Accounts for a single request (or session creation) about to be made.
+
+        :raises RateLimitedError: if the per-minute rate is exhausted
+        :raises QuotaExceededError: if the daily budget for this priority is exhausted
+        """
+        with self.lock:
+            self._check_day()
+            threshold = QUOTA_SHED_THRESHOLDS.get(priority, 1.0)
+            if self.requests_today >= self.budget() * threshold:
+                self.shed += 1
+                raise QuotaExceededError('Daily query budget reached')
+            if session and self.sessions_today >= self.session_limit:
+                self.shed += 1
+                raise QuotaExceededError('Daily session limit reached')
+            self._refill()
+            if self.tokens < 1:
+                self.shed += 1
+                raise RateLimitedError('Too many queries per minute', (1 - self.tokens) * 60.0 / self.per_minute)
+            self.tokens -= 1
+            self.requests_today += 1
+            if session:
+                self.sessions_today += 1
+
+    def needs_sync(self):
+        return self.synced_at is None or self.clock() - self.synced_at >= self.sync_interval
+
+    def mark_synced(self):
+        self.synced_at = self.clock()
+
+    def sync(self, data_used):
+        """
+        Replaces the local counters with the figures reported by 'getdataused'.
+        """
+        if isinstance(data_used, list):
+            if len(data_used) == 0:
+                return
+            data_used = data_used[0]
+        with self.lock:
+            self._check_day()
+            self.daily_limit = data_used.get('Request_Limit_Daily', self.daily_limit)
+            self.session_limit = data_used.get('Session_Cap', self.session_limit)
+            # The server figures are taken as they are, so requests counted locally but never sent are forgotten
+            self.requests_today = data_used.get('Total_Requests_Today', self.requests_today)
+            self.sessions_today = data_used.get('Total_Sessions_Today', self.sessions_today)
+            self.synced_at = self.clock()
+
+    def stats(self):
+        with self.lock:
+            self._check_day()
+            return {
+                'requests_today': self.requests_today,
+                'sessions_today': self.sessions_today,
+                'remaining': max(0, self.budget() - self.requests_today),
+                'budget': self.budget(),
+                'shed': self.shed
+            }
+
+    def _today(self):
+        return datetime.utcfromtimestamp(self.clock()).strftime('%Y%m%d')
+
+    def _check_day(self):
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            self.requests_today = 0
+            self.sessions_today = 0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(float(self.per_minute), self.tokens + (now - self.refilled_at) * self.per_minute / 60.0)
+        self.refilled_at = now
+
+
+# Python 2 has no perf_counter. time.clock is the high resolution wall clock on Windows and in IronPython, while
+# time.time only ticks every ~15 ms there (elsewhere time.clock measures CPU time, so time.time is used instead).
+if hasattr(time, 'perf_counter'):
+    _timer = time.perf_counter
+elif sys.platform in ('win32', 'cli'):
+    _timer = time.clock
+else:
+    _timer = time.time
+
+
+class RawResponse(object):
+    """
+    Response text as returned by the API, decoded at most once and only when the value is first needed. The text is
+    kept so the response can be written to disk as it was received (see StaticDataStore.put).
+    """
+    __slots__ = ('text', 'decoded')
+
+    def __init__(self, text):
+        self.text = text
+        self.decoded = None
+
+    def value(self):
+        if self.decoded is None:
+            self.decoded = json.loads(self.text)
+        return self.decoded
+
+
+class RollingHistogram(object):
+    """
+    Keeps the last `size` samples (in seconds) and summarises them as percentiles and latency buckets.
+    """
+    def __init__(self, size=METRICS_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def percentile(self, fraction):
+        if len(self.samples) == 0:
+            return 0.0
+        values = sorted(self.samples)
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def buckets(self):
+        counts = [0] * (len(METRICS_BUCKETS_MS) + 1)
+        for value in self.samples:
+            counts[bisect.bisect_left(METRICS_BUCKETS_MS, value * 1000)] += 1
+        return counts
+
+    def summary(self):
+        count = len(self.samples)
+        return {
+            'count': count,
+            'mean_ms': sum(self.samples) * 1000 / count if count > 0 else 0.0,
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'buckets': self.buckets()
+        }
+
+
+class RequestMetrics(object):
+    """
+    Per-method request metrics: call/error counters, cache hits and misses, session reuse, payload sizes and rolling
+    histograms of the time spent signing, on the network and decoding JSON.
+    """
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.methods = {}
+
+    def _get(self, method):
+        stats = self.methods.get(method)
+        if stats is None:
+            stats = {
+                'calls': 0,
+                'errors': 0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'sessions_reused': 0,
+                'sessions_created': 0,
+                'bytes': 0,
+                'timings': dict((timing, RollingHistogram(self.window)) for timing in METRICS_TIMINGS)
+            }
+            self.methods[method] = stats
+        return stats
+
+    def record_request(self, method, signature, network, decode, size):
+        with self.lock:
+            stats = self._get(method)
+            stats['calls'] += 1
+            stats['bytes'] += size
+            stats['timings']['signature'].add(signature)
+            stats['timings']['network'].add(network)
+            stats['timings']['decode'].add(decode)
+            stats['timings']['total'].add(signature + network + decode)
+
+    def record_error(self, method):
+        with self.lock:
+            self._get(method)['errors'] += 1
+
+    def record_cache(self, method, hit):
+        with self.lock:
+            self._get(method)['cache_hits' if hit else 'cache_misses'] += 1
+
+    def record_session(self, method, reused):
+        with self.lock:
+            self._get(method)['sessions_reused' if reused else 'sessions_created'] += 1
+
+    def snapshot(self):
+        """
+        Returns a JSON serialisable summary of all metrics, keyed by method.
+        """
+        with self.lock:
+            snapshot = {}
+            for method, stats in self.methods.items():
+                summary = dict((key, value) for key, value in stats.items() if key != 'timings')
+                summary['timings'] = dict((timing, histogram.summary()) for timing, histogram in stats['timings'].items())
+                snapshot[method] = summary
+            return snapshot
+
+    def dump(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as f:
+            json.dump({'time': time.time(), 'buckets_ms': METRICS_BUCKETS_MS, 'methods': self.snapshot()}, f,
+                      indent=4, sort_keys=True)
+
+
+class SingleFlight(object):
+    """
+    Collapses concurrent identical requests into one. The first caller for a key performs the request, everybody
+    asking for the same key while it is in flight waits for it and shares its result (or exception).
+    """
+    class _Call(object):
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = SingleFlight._Call()
+                self.calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+class MatchCache(object):
+    """
+    Bounded LRU cache of completed match details keyed by match id. Completed matches never change, so entries do not
+    expire.
+    """
+    def __init__(self, max_size=MATCH_CACHE_SIZE):
+        self.max_size = max_size
+        self.matches = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def is_completed(rows):
+        return isinstance(rows, list) and len(rows) > 0 and not rows[0].get('ret_msg')
+
+    def get(self, match_id):
+        with self.lock:
+            rows = self.matches.pop(match_id, None)
+            if rows is not None:
+                self.matches[match_id] = rows
+            return rows
+
+    def put(self, match_id, rows):
+        if not MatchCache.is_completed(rows):
+            return
+        with self.lock:
+            self.matches.pop(match_id, None)
+            self.matches[match_id] = rows
+            while len(self.matches) > self.max_size:
+                self.matches.popitem(last=False)
+
+    def __contains__(self, match_id):
+        with self.lock:
+            return match_id in self.matches
+
+
+class PlayerIndex(object):
+    """
+    Case-insensitive index from player name to player id per portal, filled from responses that carry both. The index
+    is a single LRU of at most `max_size` names that is loaded from the index file by load() and written back by
+    save(), so names seen before a restart still resolve and neither memory nor the file grow without bound. Saving is
+    left to the owner (see needs_save()), so requests never wait for the file to be written.
+
+    A name known on several portals only resolves without a portal if all portals agree on the id.
+    """
+    def __init__(self, path=None, max_size=PLAYER_INDEX_SIZE, save_interval=PLAYER_INDEX_SAVE_INTERVAL,
+                 clock=time.time, logger=lambda x: None):
+        self.path = path
+        self.max_size = max_size
+        self.save_interval = save_interval
+        self.clock = clock
+        self.logger = logger
+        self.entries = OrderedDict()
+        self.dirty = False
+        self.saved_at = clock()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+
+    @staticmethod
+    def normalize(name):
+        name = str(name).strip().lower()
+        # getplayer names carry the clan tag, e.g. "[tag]name"
+        if name.startswith('[') and ']' in name:
+            name = name[name.index(']') + 1:]
+        return name
+
+    def load(self):
+        """
+        Loads the index from its file, replacing the entries in memory. Does not make any API calls.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f, object_pairs_hook=OrderedDict)
+        except Exception as e:
+            self.logger('[WARNING] Could not load player index: ' + str(e))
+            return False
+        if stored.get('format') != PLAYER_INDEX_FORMAT:
+            return False
+        with self.lock:
+            self.entries = OrderedDict(stored.get('players', {}))
+            self._evict()
+        return True
+
+    def get(self, name, portal_id=None):
+        """
+        :return: Player id, or None if the name is unknown (on the given portal) or ambiguous
+        """
+        key = PlayerIndex.normalize(name)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            self.entries[key] = entry
+        if portal_id is not None:
+            return entry.get(str(portal_id))
+        ids = set(entry.values())
+        return ids.pop() if len(ids) == 1 else None
+
+    def add(self, name, player_id, portal_id=None):
+        key = PlayerIndex.normalize(name)
+        try:
+            player_id = int(player_id)
+        except (TypeError, ValueError):
+            return
+        if not key or player_id <= 0:
+            return
+        portal = str(portal_id) if portal_id else '0'
+        with self.lock:
+            before = self.entries.pop(key, None) or {}
+            # Entries are replaced rather than changed, so save() can write them without holding the lock
+            entry = dict(before)
+            # An id seen without a portal is replaced once the same id is seen with its portal
+            if portal != '0' or player_id not in entry.values():
+                entry[portal] = player_id
+                if portal != '0' and entry.get('0') == player_id:
+                    del entry['0']
+            self.entries[key] = entry
+            self._evict()
+            self.dirty = self.dirty or entry != before
+
+    def add_rows(self, method, rows):
+        """
+        Adds the players of a response, see PLAYER_INDEX_FIELDS.
+        """
+        fields = PLAYER_INDEX_FIELDS.get(method)
+        if fields is None or not isinstance(rows, list):
+            return
+        name_field, id_field, portal_field = fields
+        for row in rows:
+            if isinstance(row, dict) and row.get(name_field) and row.get(id_field):
+                self.add(row[name_field], row[id_field], row.get(portal_field) if portal_field else None)
+
+    def needs_save(self):
+        return self.dirty and self.clock() - self.saved_at >= self.save_interval
+
+    def save(self):
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        with self.save_lock:
+            with self.lock:
+                players = OrderedDict(self.entries)
+                self.saved_at = self.clock()
+                self.dirty = False
+            try:
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory)
+                with open(self.path, 'w') as f:
+                    json.dump({'format': PLAYER_INDEX_FORMAT, 'players': players}, f, separators=(',', ':'))
+            except Exception as e:
+                self.logger('[WARNING] Could not save player index: ' + str(e))
+                self.dirty = True
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def _evict(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class StaticDataStore(object):
+    """
+    On-disk store for static game data (gods, items, skins, recommended items). The data is tagged with the patch
+    version it was fetched for and is dropped as soon as a different patch is reported.
+
+    Every response is written to its own file in the store directory, once and as the text returned by the API, so
+    storing a response or recording a patch check never serialises any stored response again. Stored responses are
+    only read and decoded when first used, and only the decoded value is kept in memory.
+    """
+    def __init__(self, path, check_interval=PATCH_CHECK_INTERVAL, clock=time.time, logger=lambda x: None):
+        """
+        :param path: Directory the store is kept in
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+        self.logger = logger
+        self.patch = None
+        self.checked_at = 0
+        self.data = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def make_key(method, params=None):
+        return method if params is None else '{0}/{1}'.format(method, params)
+
+    def load(self):
+        """
+        Loads the patch version the stored data was fetched for. Does not make any API calls.
+        """
+        index_path = os.path.join(self.path, STATIC_DATA_INDEX)
+        if not os.path.exists(index_path):
+            return False
+        try:
+            with open(index_path, 'r') as f:
+                stored = json.load(f)
+        except Exception as e:
+            self.logger('[WARNING] Could not load static data: ' + str(e))
+            return False
+        if stored.get('format') != STATIC_DATA_FORMAT:
+            return False
+        self.patch = stored.get('patch')
+        self.checked_at = stored.get('checked_at', 0)
+        return True
+
+    def save(self):
+        """
+        Saves the patch version and the time of the last patch check. Responses are saved by put().
+        """
+        with self.lock:
+            try:
+                self._make_directory()
+                with open(os.path.join(self.path, STATIC_DATA_INDEX), 'w') as f:
+                    json.dump({'format': STATIC_DATA_FORMAT, 'patch': self.patch, 'checked_at': self.checked_at}, f)
+            except Exception as e:
+                self.logger('[WARNING] Could not save static data: ' + str(e))
+
+    def get(self, method, params=None):
+        """
+        :return: Decoded response or None if the response is not stored
+        """
+        key = self.make_key(method, params)
+        with self.lock:
+            if key not in self.data and self.patch is not None:
+                self.data[key] = self._read(key)
+            return self.data.get(key)
+
+    def put(self, method, params, response):
+        """
+        :param response: RawResponse to store
+        """
+        key = self.make_key(method, params)
+        text = response.text
+        if not isinstance(text, bytes):
+            text = text.encode('utf-8')
+        with self.lock:
+            try:
+                self._make_directory()
+                with open(self._file(key), 'wb') as f:
+                    f.write(text)
+            except Exception as e:
+                self.logger('[WARNING] Could not save static data: ' + str(e))
+            self.data[key] = response.value()
+
+    def needs_patch_check(self):
+        return self.clock() - self.checked_at >= self.check_interval
+
+    def set_patch(self, patch):
+        """
+        Records the current patch version. Returns True if the patch changed and the stored data was dropped.
+        """
+        with self.lock:
+            changed = patch != self.patch
+            if changed:
+                self.data = {}
+                self.patch = patch
+                self._remove_responses()
+            self.checked_at = self.clock()
+            self.save()
+            return changed
+
+    def _file(self, key):
+        return os.path.join(self.path, key.replace('/', '_') + '.json')
+
+    def _make_directory(self):
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+    def _read(self, key):
+        if not os.path.exists(self._file(key)):
+            return None
+        try:
+            with open(self._file(key), 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+        except Exception as e:
+            self.logger('[WARNING] Could not load static data: ' + str(e))
+            return None
+
+    def _remove_responses(self):
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            if name != STATIC_DATA_INDEX and name.endswith('.json'):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError as e:
+                    self.logger('[WARNING] Could not remove static data: ' + str(e))
+
+
+class RequestBuilder(object):
+    """
+    Builds signed request URLs. The timestamp is formatted once per second, signatures are memoised per
+    (method, timestamp) and the static part of every endpoint URL is built once per set of credentials.
+    """
+    def __init__(self, dev_id, auth_key, clock=time.time):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.second = None
+        self.timestamp = None
+        self.signatures = {}
+        self.set_credentials(dev_id, auth_key)
+
+    def set_credentials(self, dev_id, auth_key):
+        with self.lock:
+            self.dev_id = str(dev_id)
+            self.auth_key = str(auth_key)
+            self.prefixes = {}
+            self.signatures = {}
+
+    def get_timestamp(self):
+        second = int(self.clock())
+        with self.lock:
+            if second != self.second:
+                self.second = second
+                self.timestamp = datetime.utcfromtimestamp(second).strftime('%Y%m%d%H%M%S')
+                self.signatures = {}
+            return self.timestamp
+
+    def sign(self, method, timestamp):
+        with self.lock:
+            signature = self.signatures.get((method, timestamp))
+            if signature is None:
+                raw = self.dev_id + method + self.auth_key + timestamp
+                signature = hashlib.md5(raw.encode('utf-8')).hexdigest()
+                self.signatures[(method, timestamp)] = signature
+            return signature
+
+    def build(self, method, session=None, params=None):
+        """
+        Returns the URL of a request: {method}json/{dev_id}/{signature}[/{session}]/{timestamp}[/{params}]
+        """
+        timestamp = self.get_timestamp()
+        prefix = self.prefixes.get(method)
+        if prefix is None:
+            prefix = '{0}/{1}json/{2}/'.format(API_URL, method, self.dev_id)
+            self.prefixes[method] = prefix
+        url = prefix + self.sign(method, timestamp)
+        if session is not None:
+            url += '/' + session
+        url += '/' + timestamp
+        if params is not None:
+            url += '/' + str(params)
+        return url
+
+
 class SmiteClient(object):
     def GET(self, url, headers):
-        return json.loads(json.loads(self.Parent.GetRequest(url, headers))['response'])
+        return RawResponse(self.transport.get(url, headers)).value()
 
     def set_auth_key(self, auth_key):
-        self.auth_key = auth_key
+        self._set_credentials(self.dev_id, auth_key)
 
     def set_dev_id(self, dev_id):
+        self._set_credentials(dev_id, self.auth_key)
+
+    def _set_credentials(self, dev_id, auth_key):
+        if (dev_id, auth_key) == (self.dev_id, self.auth_key):
+            return
         self.dev_id = dev_id
+        self.auth_key = auth_key
+        self.requests.set_credentials(dev_id, auth_key)
+        self.session.invalidate()
 
-    def __init__(self, Parent, dev_id, auth_key, logger=lambda x: None):
+    def __init__(self, Parent, dev_id, auth_key, logger=lambda x: None, static_data_path=None, transport=None,
+                 match_store=None, player_index_path=None):
+        """
+        :param Parent: The chatbot's Parent object, may be None if a transport is given
+        :param static_data_path: (optional) Directory static game data is stored in (see StaticDataStore)
+        :param transport: (optional) Transport used for all requests (see Smite_Transport). Defaults to sending
+        requests through Parent.GetRequest
+        :param match_store: (optional) MatchStore (see Smite_MatchStore) that match details, match histories and
+        queue stats are saved to
+        :param player_index_path: (optional) File the player name -> id index is kept in (see PlayerIndex)
+        """
         self.Parent = Parent
+        self.transport = transport if transport is not None else ParentTransport(Parent)
         self.dev_id = dev_id
         self.auth_key = auth_key
         self.logger = logger
-        self.session = None
+        self.requests = RequestBuilder(dev_id, auth_key)
+        self.session = SessionManager(self._create_session)
+        self.cache = ResponseCache()
+        self.in_flight = SingleFlight()
+        self.matches = MatchCache()
+        self.quota = QuotaTracker()
+        self.metrics = RequestMetrics()
+        self.breaker = CircuitBreaker(self._probe)
+        self.local = threading.local()
+        self.static_data = None
+        if static_data_path is not None:
+            self.static_data = StaticDataStore(static_data_path, logger=logger)
+            self.static_data.load()
         self.god_mapping = None
+        self.god_names = None
+        self.god_rank_indexes = OrderedDict()
+        self.god_rank_lock = threading.Lock()
+        self.match_store = match_store
+        self.player_index = PlayerIndex(player_index_path, logger=logger)
+        self.player_index.load()
 
 
     def ping(self):
@@ -215,8 +1340,9 @@ class SmiteClient(object):
         :param player: Player id or name
         :param portal_id: (optional, not recommended) Portal id. Refer to the enum class Portal
         """
-        if portal_id is None:
-            return self._make_request('getplayer', str(player))
+        player_id = self._resolve_player(player, portal_id)
+        if player_id is not None or portal_id is None:
+            return self._make_request('getplayer', str(player_id or player))
         else:
             return self._make_request('getplayer', '{0}/{1}'.format(player, portal_id))
 
@@ -236,7 +1362,68 @@ class SmiteClient(object):
 
         :param player: Player name or id
         """
-        return self._make_request('getfriends', str(player))
+        return self._make_request('getfriends', self._player_param(player))
+
+    def get_players(self, players, concurrency=PLAYER_FANOUT_CONCURRENCY):
+        """
+        Generator of (player, getplayer rows) for a list of players, yielded as soon as each response arrives. Repeated
+        players are requested once, cached players are yielded first without a query and the rest are requested with
+        up to `concurrency` requests in flight, at the quota priority of the calling thread.
+
+        :param players: Iterable of player names or ids
+        :param concurrency: Maximum number of requests in flight
+        """
+        unique = []
+        seen = set()
+        for player in players:
+            key = str(player).lower()
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(player)
+
+        missing = []
+        for player in unique:
+            if self.cache.contains('getplayer', self._player_param(player)):
+                yield player, self.get_player(player)
+            else:
+                missing.append(player)
+
+        priority = getattr(self.local, 'priority', PRIORITY_NORMAL)
+        results = queue.Queue()
+
+        def fetch(player):
+            try:
+                with self.priority(priority):
+                    results.put((player, self.get_player(player), None))
+            except Exception as e:
+                results.put((player, None, e))
+
+        next_player = 0
+        running = 0
+        while next_player < len(missing) or running > 0:
+            while running < max(1, concurrency) and next_player < len(missing):
+                worker = threading.Thread(target=fetch, args=(missing[next_player],))
+                worker.daemon = True
+                worker.start()
+                next_player += 1
+                running += 1
+            player, rows, error = results.get()
+            running -= 1
+            if isinstance(error, (QuotaExceededError, ApiUnavailableError)):
+                raise error
+            if error is not None:
+                self.logger('[WARNING] Could not get player {0}: {1}'.format(player, error))
+                rows = []
+            yield player, rows
+
+    def get_friend_records(self, player, concurrency=PLAYER_FANOUT_CONCURRENCY):
+        """
+        Generator of (friend, getplayer rows) for all friends of a player, see get_players(). [PC only]
+
+        :param player: Player name or id
+        """
+        friends = [friend.get('player_id') or friend.get('name') for friend in self.get_friends(player)]
+        return self.get_players([friend for friend in friends if friend and friend != '0'], concurrency)
 
     def get_god_ranks(self, player):
         """
@@ -244,7 +1431,7 @@ class SmiteClient(object):
 
         :param player: Player name or id
         """
-        return self._make_request('getgodranks', str(player))
+        return self._make_request('getgodranks', self._player_param(player))
 
     def get_player_achievements(self, player_id):
         """
@@ -266,7 +1453,7 @@ class SmiteClient(object):
 
         :param player: Player name or id
         """
-        return self._make_request('getplayerstatus', str(player))
+        return self._make_request('getplayerstatus', self._player_param(player))
 
     def get_match_history(self, player):
         """
@@ -274,7 +1461,9 @@ class SmiteClient(object):
 
         :param player: Player name or id
         """
-        return self._make_request('getmatchhistory', str(player))
+        rows = self._make_request('getmatchhistory', self._player_param(player))
+        self._store('add_match_history', rows)
+        return rows
 
     def get_queue_stats(self, player, queue):
         """
@@ -284,7 +1473,9 @@ class SmiteClient(object):
         :param queue: Queue id - Only supported ones are 440 (Duel), 450 (Ranked Joust) and 451 (Ranked Conquest).
         Refer to the enum class Queue
         """
-        return self._make_request('getqueuestats', '{0}/{1}'.format(player, queue))
+        rows = self._make_request('getqueuestats', '{0}/{1}'.format(self._player_param(player), queue))
+        self._store('add_queue_stats', player, queue, rows)
+        return rows
 
 
     def get_match_details(self, match_id):
@@ -293,7 +1484,46 @@ class SmiteClient(object):
 
         :param match_id: Match id
         """
-        return self._make_request('getmatchdetails', str(match_id))
+        rows = self.matches.get(int(match_id))
+        if rows is None:
+            rows = self._make_request('getmatchdetails', str(match_id))
+            self.matches.put(int(match_id), rows)
+            self._store('add_match_details', rows)
+        return rows
+
+    def get_match_details_batch(self, match_ids):
+        """
+        Returns the statistics for multiple completed matches. Matches already seen are served from the local cache,
+        the rest are requested in batches of 10 (one query per batch).
+
+        :param match_ids: Iterable of match ids
+        :return: OrderedDict from match id to the list of player rows of that match, in the order of match_ids.
+        Matches the API returned no data for are left out.
+        """
+        ids = []
+        for match_id in match_ids:
+            match_id = int(match_id)
+            if match_id not in ids:
+                ids.append(match_id)
+
+        fetched = {}
+        missing = [match_id for match_id in ids if match_id not in self.matches]
+        for i in range(0, len(missing), MATCH_BATCH_SIZE):
+            batch = missing[i:i + MATCH_BATCH_SIZE]
+            response = self._make_request('getmatchdetailsbatch', ','.join(str(match_id) for match_id in batch))
+            for match_id, rows in self._group_match_rows(response).items():
+                fetched[match_id] = rows
+                self.matches.put(match_id, rows)
+            self._store('add_match_details', response)
+
+        result = OrderedDict()
+        for match_id in ids:
+            rows = fetched.get(match_id)
+            if rows is None:
+                rows = self.matches.get(match_id)
+            if rows is not None:
+                result[match_id] = rows
+        return result
 
     def get_match_ids_by_queue(self, queue, date, hour, minute_window):
         """
@@ -353,6 +1583,23 @@ class SmiteClient(object):
         """
         return self._make_request('getteamplayers', str(clan_id))
 
+    def get_team_player_records(self, clan_id, concurrency=PLAYER_FANOUT_CONCURRENCY):
+        """
+        Generator of (member name, getplayer rows) for all members of a clan, see get_players().
+
+        :param clan_id: Clan id
+        """
+        members = [member.get('Name') for member in self.get_team_players(clan_id)]
+        return self.get_players([member for member in members if member], concurrency)
+
+    def search_teams(self, search_team):
+        """
+        Returns high level information for clan names containing the search string.
+
+        :param search_team: Part of a clan name or tag
+        """
+        return self._make_request('searchteams', str(search_team))
+
     def get_esports_pro_league_details(self):
         """
         Returns the matchup information for each matchup for the current eSports Pro League season. An important
@@ -367,51 +1614,298 @@ class SmiteClient(object):
         return self._make_request('getmotd')
 
 
+    @contextmanager
+    def priority(self, level):
+        """
+        Sets the quota priority of all requests made by the current thread inside the with block.
+
+        :param level: One of PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW
+        """
+        previous = getattr(self.local, 'priority', PRIORITY_NORMAL)
+        self.local.priority = level
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+
+    def pop_stale_age(self):
+        """
+        Returns the age in seconds of the oldest stale response served to the current thread (because the API was
+        unavailable) since the last call, or None if all responses were fresh.
+        """
+        age = getattr(self.local, 'stale_age', None)
+        self.local.stale_age = None
+        return age
+
+    @contextmanager
+    def refresh(self, ttl=None):
+        """
+        Requests made by the current thread inside the with block bypass the response cache and their responses are
+        cached for ttl seconds (or the method's default time to live). Used to keep frequently requested data warm.
+        """
+        previous = getattr(self.local, 'refresh_ttl', None)
+        self.local.refresh_ttl = ttl if ttl is not None else 0
+        try:
+            yield
+        finally:
+            self.local.refresh_ttl = previous
+
+    def sync_quota(self, force=False):
+        """
+        Corrects the local quota counters with 'getdataused'. Costs a query, and only if the last sync is older than the
+        sync interval (or force is set).
+        """
+        if not force and not self.quota.needs_sync():
+            return
+        self.quota.mark_synced()
+        try:
+            self.quota.sync(self.get_data_used())
+        except Exception as e:
+            self.logger('[WARNING] Could not sync quota: ' + str(e))
+
+    def refresh_static_data(self, force=False):
+        """
+        Compares the stored static data against the current patch and drops it if a new patch was deployed.
+        Costs a single query, and only if the last check is older than the check interval (or force is set).
+
+        :return: True if the stored data was dropped
+        """
+        if self.static_data is None or (not force and not self.static_data.needs_patch_check()):
+            return False
+        patch_info = self.get_patch_info()
+        if isinstance(patch_info, list):
+            patch_info = patch_info[0] if len(patch_info) > 0 else {}
+        # An error payload carries no version and must not be taken for a new patch
+        if not patch_info.get('version_string'):
+            return False
+        changed = self.static_data.set_patch(patch_info['version_string'])
+        if changed:
+            for method in STATIC_DATA_METHODS:
+                self.cache.invalidate_method(method)
+            self.god_mapping = None
+            self.god_names = None
+        return changed
+
+    def _get_static_data(self, method, params):
+        try:
+            self.refresh_static_data()
+        except ApiUnavailableError:
+            pass
+        stored = self.static_data.get(method, params)
+        # Error payloads stored by older versions are ignored and replaced
+        if stored is not None and not ResponseCache.is_cacheable(stored):
+            stored = None
+        self.metrics.record_cache(method, stored is not None)
+        if stored is not None:
+            return stored
+        response = self.in_flight.do((method, params), lambda: self._fetch(method, params, False))
+        if ResponseCache.is_cacheable(response.value()):
+            self.static_data.put(method, params, response)
+        return response.value()
+
+    def find_god(self, god_name):
+        """
+        Resolves a partial or misspelled god name. If the internal mapping is not already initialised, an extra query
+        will be spent.
+
+        :return: Tuple (god name or None, list of suggested god names)
+        """
+        if self.god_names is None:
+            self._cache_god_ids()
+        return self.god_names.resolve(god_name)
+
+    def get_god_rank_index(self, player):
+        """
+        Returns the god ranks of a player as a dictionary from normalised god name to rank row. The index is rebuilt
+        only when the underlying 'getgodranks' response changes.
+
+        :param player: Player name or id
+        """
+        ranks = self.get_god_ranks(player)
+        key = str(player).lower()
+        with self.god_rank_lock:
+            entry = self.god_rank_indexes.pop(key, None)
+            if entry is None or entry[0] is not ranks:
+                entry = (ranks, dict((_normalize_god_name(rank['god']), rank) for rank in ranks))
+            self.god_rank_indexes[key] = entry
+            while len(self.god_rank_indexes) > GOD_RANK_INDEX_SIZE:
+                self.god_rank_indexes.popitem(last=False)
+        return entry[1]
+
+    def get_god_rank(self, player, god_name, ranks=None):
+        """
+        Returns the rank row of a player for a god or None if the player has no stats on that god.
+
+        :param player: Player name or id
+        :param god_name: God name
+        :param ranks: (optional) Index already returned by get_god_rank_index for the player
+        """
+        if ranks is None:
+            ranks = self.get_god_rank_index(player)
+        return ranks.get(_normalize_god_name(god_name))
+
+    def _resolve_player(self, player, portal_id=None):
+        """
+        Returns the player id of a player name from the player index, or None if it is not known. Ids are not resolved.
+        """
+        if isinstance(player, int) or str(player).isdigit():
+            return None
+        return self.player_index.get(player, portal_id)
+
+    def _player_param(self, player):
+        """
+        Player request parameter: the player id if the name is in the player index, so follow-up requests are made
+        (and cached) by id, otherwise the player as given.
+        """
+        player_id = self._resolve_player(player)
+        return str(player_id if player_id is not None else player)
+
+    def _index_players(self, method, params, rows):
+        if method == 'getplayeridbyname':
+            for row in rows if isinstance(rows, list) else []:
+                self.player_index.add(params, row.get('player_id'), row.get('portal_id'))
+        else:
+            self.player_index.add_rows(method, rows)
+
+    def _store(self, method, *args):
+        if self.match_store is None:
+            return
+        try:
+            getattr(self.match_store, method)(*args)
+        except Exception as e:
+            self.logger('[WARNING] Could not save to the match store: ' + str(e))
+
+    @staticmethod
+    def _group_match_rows(response):
+        grouped = {}
+        seen = set()
+        for row in response:
+            if row.get('Match') is None:
+                continue
+            match_id = int(row['Match'])
+            key = (match_id, row.get('playerId'), row.get('playerName'), row.get('TaskForce'))
+            if key in seen:
+                continue
+            seen.add(key)
+            grouped.setdefault(match_id, []).append(row)
+        return grouped
+
     def _cache_god_ids(self):
         god_data = self.get_gods()
-        self.god_mapping = {}
+        if not ResponseCache.is_cacheable(god_data):
+            raise ApiUnavailableError('Could not get the list of gods: {0}'.format(god_data))
+        god_mapping = {}
         for god in god_data:
-            self.god_mapping[god['Name'].lower()] = god['id']
+            god_mapping[_normalize_god_name(god['Name'])] = god['id']
+        self.god_names = GodNameIndex(god['Name'] for god in god_data)
+        self.god_mapping = god_mapping
 
     def _translate_god_name(self, god_name):
         if self.god_mapping is None:
             self._cache_god_ids()
-        return self.god_mapping[god_name.lower()]
-
-    def _make_signature(self, method, timestamp):
-        return hashlib.md5(self.dev_id + method + self.auth_key + timestamp).hexdigest()
-
-    def _get_timestamp(self):
-        return datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        resolved, _ = self.god_names.resolve(god_name)
+        if resolved is None:
+            raise KeyError(god_name)
+        return self.god_mapping[_normalize_god_name(resolved)]
 
     def _create_session(self):
-        ts = self._get_timestamp()
-        request = API_URL + '/createsessionjson/{0}/{1}/{2}'.format(self.dev_id, self._make_signature('createsession', ts), ts)
-        response = self.GET(request, {})
-
-        if response['ret_msg'] != 'Approved':
-            self.logger('[ERROR] Could not create session: ' + response['ret_msg'])
+        self._acquire(PRIORITY_HIGH, session=True)
+        started = _timer()
+        request = self.requests.build('createsession')
+        response = self._timed_get('createsession', request, started).value()
+
+        # Raised rather than returned, so the session manager never keeps a session id of None and no request is sent
+        # (or retried) without a session
+        if not isinstance(response, dict) or response.get('ret_msg') != 'Approved' or not response.get('session_id'):
+            message = response.get('ret_msg') if isinstance(response, dict) else response
+            self.logger('[ERROR] Could not create session: {0}'.format(message))
+            raise SessionRefusedError('Could not create session: {0}'.format(message))
         return response['session_id']
 
-    def _get_session(self):
-        if self.session is None or not self._test_session(self.session):
-            self.session = self._create_session()
-        return self.session
-
-    def _test_session(self, session):
-        ts = self._get_timestamp()
-        request = API_URL + '/testsessionjson/{0}/{1}/{2}/{3}'.format(self.dev_id,
-                                                                self._make_signature('testsession', ts), session, ts)
-        try:
-            return 'successful' in self.GET(request, {})
-        except:
-            return False
-
     def _make_request(self, method, params=None):
-        ts = self._get_timestamp()
-        request = API_URL + '/{0}json/{1}/{2}/{3}/{4}'.format(method, self.dev_id, self._make_signature(method, ts),
-                                                              self._get_session(), ts)
-        
-        if params is not None:
-            request += '/{}'.format(params)
-        return self.GET(request, {})
+        if self.static_data is not None and method in STATIC_DATA_METHODS:
+            return self._get_static_data(method, params)
+        return self._get_response(method, params)
+
+    def _get_response(self, method, params):
+        refresh_ttl = getattr(self.local, 'refresh_ttl', None)
+        if refresh_ttl is not None:
+            response = self.in_flight.do((method, params), lambda: self._fetch(method, params, False)).value()
+            if ResponseCache.is_cacheable(response):
+                self._cache_response(method, params, response, refresh_ttl or None)
+            return response
+
+        response = self.cache.get(method, params)
+        self.metrics.record_cache(method, response is not None)
+        if response is not None:
+            return response
+        try:
+            return self.in_flight.do((method, params), lambda: self._fetch(method, params)).value()
+        except ApiUnavailableError:
+            response, age = self.cache.get_stale(method, params)
+            if response is None:
+                raise
+            self.local.stale_age = max(age, getattr(self.local, 'stale_age', None) or 0)
+            return response
+
+    def _probe(self):
+        return 'successful' in str(self.ping()).lower()
+
+    def _fetch(self, method, params, cache=True):
+        # The session is created first, so a refused session does not leave a request counted that was never sent
+        renewals = self.session.renewals
+        session_id = self.session.get()
+        self.metrics.record_session(method, self.session.renewals == renewals)
+        self._acquire(getattr(self.local, 'priority', PRIORITY_NORMAL))
+        response = self._send_request(method, params, session_id)
+        if SessionManager.is_invalid_response(response.value()):
+            self.session.invalidate(session_id)
+            session_id = self.session.get()
+            self._acquire(PRIORITY_HIGH)
+            response = self._send_request(method, params, session_id)
+            if SessionManager.is_invalid_response(response.value()):
+                return response
+        self._index_players(method, params, response.value())
+        if cache and ResponseCache.is_cacheable(response.value()):
+            self._cache_response(method, params, response.value())
+        self.sync_quota()
+        return response
+
+    def _acquire(self, priority, session=False):
+        # The breaker is checked first, so requests it refuses are not charged to the quota. It is also checked before
+        # the request timings start, so a probe of the API is not counted as signing time.
+        self.breaker.before_request()
+        self.quota.acquire(priority, session)
+
+    def _cache_response(self, method, params, response, ttl=None):
+        self.cache.put(method, params, response, ttl)
+        # Once a name is in the player index, follow-up requests are made by id (see _player_param), so a response
+        # requested by name is also cached under the id it resolved to
+        if method not in PLAYER_PARAM_METHODS or params is None:
+            return
+        player, separator, rest = params.partition('/')
+        if method == 'getplayer' and separator:
+            return
+        player_id = self._resolve_player(player)
+        if player_id is not None:
+            self.cache.put(method, str(player_id) + separator + rest, response, ttl)
+
+    def _send_request(self, method, params, session):
+        started = _timer()
+        request = self.requests.build(method, session, params)
+        return self._timed_get(method, request, started)
+
+    def _timed_get(self, method, request, started):
+        signed = _timer()
+        try:
+            raw = self.transport.get(request, {})
+            received = _timer()
+            response = RawResponse(raw)
+            response.value()
+        except Exception as e:
+            self.metrics.record_error(method)
+            self.breaker.record_failure()
+            raise ApiUnavailableError('Smite API request failed: {0}'.format(e))
+        self.breaker.record_success()
+        self.metrics.record_request(method, signed - started, received - signed, _timer() - received, len(raw))
+        return response
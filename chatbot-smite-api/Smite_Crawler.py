@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from Smite_Api import MATCH_BATCH_SIZE
+from Smite_Api import PRIORITY_LOW
+from Smite_Api import RateLimitedError
+
+HOURS = 24
+MINUTE_WINDOWS = 6
+
+
+class QueueCrawler(object):
+    """
+    Walks all 10 minute windows of a day for a queue and streams the details of every completed match without keeping
+    the day in memory. Match details are fetched in batches with a bounded number of batches in flight.
+
+    Requests refused by the per-minute rate limit are retried once the limit allows it, only an exhausted daily budget
+    (QuotaExceededError) ends a crawl.
+
+    Progress is checkpointed after every batch, so a crawl interrupted by an exception (e.g. QuotaExceededError)
+    resumes where it stopped when crawl() is called again. Matches of a batch that was only partially consumed may be
+    yielded again after resuming.
+    """
+    def __init__(self, client, queue_id, date, checkpoint_path=None, concurrency=2, priority=PRIORITY_LOW):
+        """
+        :param client: SmiteClient used for all requests
+        :param queue_id: Queue id - refer to the enum class Queue
+        :param date: Date in YYYYMMDD format
+        :param checkpoint_path: (optional) File the crawl progress is stored in
+        :param concurrency: Maximum number of match detail batches requested at the same time
+        :param priority: Quota priority of the crawl requests
+        """
+        self.client = client
+        self.queue_id = queue_id
+        self.date = str(date)
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = max(1, concurrency)
+        self.priority = priority
+
+    def crawl(self):
+        """
+        Generator of (match id, list of player rows) for every completed match of the day.
+        """
+        checkpoint = self._load_checkpoint()
+        start = (checkpoint['hour'], checkpoint['minute_window'])
+        for hour in range(HOURS):
+            for minute_window in range(MINUTE_WINDOWS):
+                if (hour, minute_window) < start:
+                    continue
+                done = set(checkpoint['done']) if (hour, minute_window) == start else set()
+                self._save_checkpoint(hour, minute_window, done)
+
+                for batch in self._fetch_batches(self._get_match_ids(hour, minute_window, done)):
+                    for match_id, rows in batch.items():
+                        yield match_id, rows
+                        done.add(match_id)
+                    self._save_checkpoint(hour, minute_window, done)
+        self._save_checkpoint(HOURS, 0, set())
+
+    def _get_match_ids(self, hour, minute_window, done):
+        response = self._call(self.client.get_match_ids_by_queue, self.queue_id, self.date, hour, minute_window)
+        match_ids = []
+        for match in response:
+            active = match.get('Active_Flag', match.get('active_flag'))
+            if match.get('Match') is None or str(active).lower() == 'y':
+                continue
+            match_id = int(match['Match'])
+            if match_id not in done:
+                match_ids.append(match_id)
+        return match_ids
+
+    def _fetch_batches(self, match_ids):
+        batches = [match_ids[i:i + MATCH_BATCH_SIZE] for i in range(0, len(match_ids), MATCH_BATCH_SIZE)]
+        results = queue.Queue()
+
+        def fetch(batch):
+            try:
+                results.put((self._call(self.client.get_match_details_batch, batch), None))
+            except Exception as e:
+                results.put((None, e))
+
+        next_batch = 0
+        running = 0
+        while next_batch < len(batches) or running > 0:
+            while running < self.concurrency and next_batch < len(batches):
+                worker = threading.Thread(target=fetch, args=(batches[next_batch],))
+                worker.daemon = True
+                worker.start()
+                next_batch += 1
+                running += 1
+            matches, error = results.get()
+            running -= 1
+            if error is not None:
+                raise error
+            yield matches
+
+    def _call(self, request, *args):
+        while True:
+            try:
+                with self.client.priority(self.priority):
+                    return request(*args)
+            except RateLimitedError as e:
+                time.sleep(e.retry_after)
+
+    def _load_checkpoint(self):
+        checkpoint = {'hour': 0, 'minute_window': 0, 'done': []}
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return checkpoint
+        with open(self.checkpoint_path, 'r') as f:
+            stored = json.load(f)
+        if stored.get('queue') != self.queue_id or stored.get('date') != self.date:
+            return checkpoint
+        return stored
+
+    def _save_checkpoint(self, hour, minute_window, done):
+        if self.checkpoint_path is None:
+            return
+        with open(self.checkpoint_path, 'w') as f:
+            json.dump({
+                'queue': self.queue_id,
+                'date': self.date,
+                'hour': hour,
+                'minute_window': minute_window,
+                'done': sorted(done)
+            }, f, separators=(',', ':'))
@@ -0,0 +1,171 @@
+import time
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+# Snapshots older than this are removed (the latest snapshot of every board is always kept)
+SNAPSHOT_MAX_AGE = 14 * 24 * 3600
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS snapshots (
+        snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        board TEXT NOT NULL,
+        taken_at REAL NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS snapshots_by_board ON snapshots (board, taken_at)',
+    '''CREATE TABLE IF NOT EXISTS entries (
+        snapshot_id INTEGER NOT NULL,
+        player_id INTEGER NOT NULL,
+        position INTEGER,
+        points INTEGER,
+        wins INTEGER,
+        losses INTEGER,
+        PRIMARY KEY (snapshot_id, player_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS players (
+        player_id INTEGER PRIMARY KEY,
+        name TEXT
+    )''',
+]
+
+
+def league_board(queue, tier, round):
+    return 'league/{0}/{1}/{2}'.format(queue, tier, round)
+
+
+def god_board(god_id, queue):
+    return 'god/{0}/{1}'.format(god_id, queue)
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class LeaderboardStore(object):
+    """
+    Snapshots of getleagueleaderboard / getgodleaderboard tables in a local SQLite database. A snapshot only stores
+    (position, points, wins, losses) per player id, player names are kept once, and a table identical to the previous
+    snapshot of its board is not stored again. Movement between two snapshots is a join on player id, so questions
+    like "biggest climbers today" are answered without any query.
+    """
+    def __init__(self, path, max_age=SNAPSHOT_MAX_AGE, clock=time.time):
+        if sqlite3 is None:
+            raise ImportError('sqlite3 is not available')
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def add_snapshot(self, board, rows):
+        """
+        Stores a leaderboard table. Positions are taken from the order of the rows.
+
+        :param board: Board key, see league_board() and god_board()
+        :param rows: Rows of a getleagueleaderboard or getgodleaderboard response
+        :return: Snapshot id, or None if the table did not change since the last snapshot
+        """
+        entries = []
+        names = []
+        for row in rows:
+            player_id = _int(row.get('player_id'))
+            if player_id == 0 or row.get('ret_msg'):
+                continue
+            entries.append((player_id, len(entries) + 1, _int(row.get('Points')),
+                            _int(row.get('Wins', row.get('wins'))), _int(row.get('Losses', row.get('losses')))))
+            names.append((player_id, row.get('Name') or row.get('player_name')))
+        if len(entries) == 0:
+            return None
+
+        now = self.clock()
+        with self.lock:
+            latest = self._latest(board)
+            if latest is not None and self._entries(latest[0]) == sorted(entries):
+                return None
+            cursor = self.connection.execute('INSERT INTO snapshots (board, taken_at) VALUES (?, ?)', (board, now))
+            snapshot_id = cursor.lastrowid
+            self.connection.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                                        [(snapshot_id,) + entry for entry in entries])
+            self.connection.executemany('INSERT OR REPLACE INTO players VALUES (?, ?)', names)
+            self._prune(board, now)
+            self.connection.commit()
+        return snapshot_id
+
+    def movement(self, board, since, count=3):
+        """
+        Compares the latest snapshot of a board to its state at `since`, i.e. the last snapshot taken up to then (or
+        the first one taken after it, if the board was not tracked yet).
+
+        :param since: Timestamp of the baseline
+        :param count: Number of players to return
+        :return: List of dicts (player_id, name, old_position, position, climbed, points_gained) of players on both
+        snapshots, biggest climbers first. Empty if there are not two snapshots to compare
+        """
+        with self.lock:
+            latest = self._latest(board)
+            baseline = self.connection.execute(
+                'SELECT snapshot_id FROM snapshots WHERE board = ? AND taken_at <= ? ORDER BY taken_at DESC LIMIT 1',
+                (board, since)).fetchone()
+            if baseline is None:
+                baseline = self.connection.execute(
+                    'SELECT snapshot_id FROM snapshots WHERE board = ? AND taken_at > ? ORDER BY taken_at LIMIT 1',
+                    (board, since)).fetchone()
+            if latest is None or baseline is None or latest[0] == baseline[0]:
+                return []
+            rows = self.connection.execute(
+                'SELECT n.player_id, p.name, o.position, n.position, n.points - o.points FROM entries n '
+                'JOIN entries o ON o.snapshot_id = ? AND o.player_id = n.player_id '
+                'LEFT JOIN players p ON p.player_id = n.player_id '
+                'WHERE n.snapshot_id = ? ORDER BY o.position - n.position DESC, n.points - o.points DESC LIMIT ?',
+                (baseline[0], latest[0], count)).fetchall()
+        return [{
+            'player_id': player_id,
+            'name': name,
+            'old_position': old_position,
+            'position': position,
+            'climbed': old_position - position,
+            'points_gained': points_gained
+        } for player_id, name, old_position, position, points_gained in rows]
+
+    def latest(self, board):
+        """
+        :return: List of (player_id, name, position, points, wins, losses) of the latest snapshot of a board
+        """
+        with self.lock:
+            snapshot = self._latest(board)
+            if snapshot is None:
+                return []
+            return self.connection.execute(
+                'SELECT e.player_id, p.name, e.position, e.points, e.wins, e.losses FROM entries e '
+                'LEFT JOIN players p ON p.player_id = e.player_id WHERE e.snapshot_id = ? ORDER BY e.position',
+                (snapshot[0],)).fetchall()
+
+    def _latest(self, board):
+        return self.connection.execute(
+            'SELECT snapshot_id, taken_at FROM snapshots WHERE board = ? ORDER BY taken_at DESC, snapshot_id DESC '
+            'LIMIT 1', (board,)).fetchone()
+
+    def _entries(self, snapshot_id):
+        return [tuple(entry) for entry in self.connection.execute(
+            'SELECT player_id, position, points, wins, losses FROM entries WHERE snapshot_id = ? ORDER BY player_id',
+            (snapshot_id,))]
+
+    def _prune(self, board, now):
+        old = [row[0] for row in self.connection.execute(
+            'SELECT snapshot_id FROM snapshots WHERE board = ? AND taken_at < ?', (board, now - self.max_age))]
+        for snapshot_id in old:
+            self.connection.execute('DELETE FROM entries WHERE snapshot_id = ?', (snapshot_id,))
+            self.connection.execute('DELETE FROM snapshots WHERE snapshot_id = ?', (snapshot_id,))
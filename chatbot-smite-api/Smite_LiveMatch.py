@@ -0,0 +1,158 @@
+import time
+import threading
+from collections import deque
+
+from Smite_Api import PRIORITY_LOW
+
+STATUS_OFFLINE = 0
+STATUS_IN_LOBBY = 1
+STATUS_GOD_SELECTION = 2
+STATUS_IN_GAME = 3
+STATUS_ONLINE = 4
+STATUS_UNKNOWN = 5
+
+# (first, longest) seconds between status polls per status. The interval starts at the first value whenever the status
+# changes and doubles with every unchanged poll, so idle players are polled rarely and god selection is polled quickly.
+POLL_INTERVALS = {
+    STATUS_OFFLINE: (120, 900),
+    STATUS_IN_LOBBY: (30, 120),
+    STATUS_GOD_SELECTION: (10, 10),
+    STATUS_IN_GAME: (60, 240),
+    STATUS_ONLINE: (60, 300),
+    STATUS_UNKNOWN: (900, 3600),
+}
+# Used before the first status is known and after a failed poll
+DEFAULT_POLL_INTERVAL = (30, 900)
+
+EVENT_STATUS = 'status'
+EVENT_MATCH_STARTED = 'match_started'
+EVENT_MATCH_ENDED = 'match_ended'
+
+
+class LiveMatchTracker(object):
+    """
+    Follows the live status of a set of players with getplayerstatus, polling each player with an adaptive interval.
+    When a player enters a match, the lobby is fetched once with getmatchplayerdetails and kept until the match ends,
+    so questions about the current match are answered from get() without any query.
+
+    Driven by calling tick() (from Tick()), polls run on a WorkerPool. Changes are recorded as events (event, player,
+    state) that are collected with drain_events(); nothing is recorded while a player's state stays the same.
+    """
+    def __init__(self, client, workers, players=(), clock=time.time, logger=lambda x: None, priority=PRIORITY_LOW):
+        """
+        :param client: SmiteClient used for all requests
+        :param workers: WorkerPool the polls run on
+        :param players: Names of the tracked players
+        :param priority: Quota priority of the polls
+        """
+        self.client = client
+        self.workers = workers
+        self.clock = clock
+        self.logger = logger
+        self.priority = priority
+        self.lock = threading.Lock()
+        self.players = {}
+        self.events = deque()
+        self.set_players(players)
+
+    def set_players(self, players):
+        """
+        Replaces the tracked players, keeping the state of players that stay tracked.
+        """
+        players = [str(player).lower() for player in players if player]
+        with self.lock:
+            self.players = dict((player, self.players.get(player) or LiveMatchTracker._new_state())
+                                for player in players)
+
+    def get(self, player):
+        """
+        :return: Copy of the tracked state of a player (status, status_string, match, queue, lobby, since), or None if
+        the player is not tracked
+        """
+        with self.lock:
+            state = self.players.get(str(player).lower())
+            return LiveMatchTracker._public(state) if state is not None else None
+
+    def drain_events(self):
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def tick(self):
+        now = self.clock()
+        with self.lock:
+            due = [(player, state) for player, state in self.players.items()
+                   if not state['polling'] and state['next_poll'] <= now]
+        for player, state in due:
+            state['polling'] = True
+            if not self.workers.submit(self._poll, player, state):
+                state['polling'] = False
+
+    def _poll(self, player, state):
+        try:
+            with self.client.priority(self.priority), self.client.refresh():
+                rows = self.client.get_player_status(player)
+            status = rows[0] if len(rows) > 0 else {}
+            self._update(player, state, status)
+        except Exception as e:
+            self.logger('[WARNING] Could not poll status of {0}: {1}'.format(player, e))
+            self._schedule(state, None, False)
+        finally:
+            state['polling'] = False
+
+    def _update(self, player, state, status):
+        code = status.get('status', STATUS_UNKNOWN)
+        match_id = status.get('Match') or None
+        in_game = code == STATUS_IN_GAME and match_id is not None
+        was_in_game = state['status'] == STATUS_IN_GAME and state['match'] is not None
+        new_match = in_game and (not was_in_game or match_id != state['match'])
+
+        # The lobby is fetched once per match (again only if fetching it failed)
+        if in_game and (new_match or state['lobby'] is None):
+            lobby = self._get_lobby(match_id)
+            with self.lock:
+                state['lobby'] = lobby
+        elif not in_game and state['lobby'] is not None:
+            with self.lock:
+                state['lobby'] = None
+
+        changed = code != state['status'] or match_id != state['match']
+        if changed:
+            ended = was_in_game and (not in_game or match_id != state['match'])
+            with self.lock:
+                state['status'] = code
+                state['status_string'] = status.get('status_string')
+                state['match'] = match_id
+                state['queue'] = status.get('match_queue_id') or None
+                state['since'] = self.clock()
+            if ended:
+                self.events.append((EVENT_MATCH_ENDED, player, self.get(player)))
+            self.events.append((EVENT_MATCH_STARTED if new_match else EVENT_STATUS, player, self.get(player)))
+        self._schedule(state, code, changed)
+
+    def _get_lobby(self, match_id):
+        try:
+            with self.client.priority(self.priority):
+                return self.client.get_match_player_details(match_id)
+        except Exception as e:
+            self.logger('[WARNING] Could not get lobby of match {0}: {1}'.format(match_id, e))
+            return None
+
+    def _schedule(self, state, code, changed):
+        first, longest = POLL_INTERVALS.get(code, DEFAULT_POLL_INTERVAL)
+        if changed or state['interval'] is None:
+            interval = first
+        else:
+            interval = min(longest, max(first, state['interval'] * 2))
+        state['interval'] = interval
+        state['next_poll'] = self.clock() + interval
+
+    @staticmethod
+    def _new_state():
+        return {'status': None, 'status_string': None, 'match': None, 'queue': None, 'lobby': None, 'since': None,
+                'interval': None, 'next_poll': 0, 'polling': False}
+
+    @staticmethod
+    def _public(state):
+        return dict((key, state[key]) for key in ('status', 'status_string', 'match', 'queue', 'lobby', 'since'))
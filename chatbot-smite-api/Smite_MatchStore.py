@@ -0,0 +1,199 @@
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS matches (
+        match_id INTEGER PRIMARY KEY,
+        queue INTEGER,
+        match_time TEXT,
+        minutes INTEGER,
+        winning_task_force INTEGER
+    )''',
+    '''CREATE TABLE IF NOT EXISTS player_matches (
+        match_id INTEGER NOT NULL,
+        player_id INTEGER NOT NULL,
+        name_key TEXT NOT NULL,
+        player_name TEXT,
+        queue INTEGER,
+        god TEXT,
+        god_id INTEGER,
+        task_force INTEGER,
+        win INTEGER,
+        kills INTEGER,
+        deaths INTEGER,
+        assists INTEGER,
+        minutes INTEGER,
+        PRIMARY KEY (match_id, player_id, name_key)
+    )''',
+    'CREATE INDEX IF NOT EXISTS player_matches_by_id ON player_matches (player_id, queue, match_id)',
+    'CREATE INDEX IF NOT EXISTS player_matches_by_name ON player_matches (name_key, queue, match_id)',
+    '''CREATE TABLE IF NOT EXISTS queue_stats (
+        player_key TEXT NOT NULL,
+        queue INTEGER NOT NULL,
+        god TEXT NOT NULL,
+        matches INTEGER,
+        wins INTEGER,
+        losses INTEGER,
+        kills INTEGER,
+        deaths INTEGER,
+        assists INTEGER,
+        PRIMARY KEY (player_key, queue, god)
+    )''',
+]
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class MatchStore(object):
+    """
+    Local SQLite store of match and player-match rows, filled from getmatchdetails(batch), getmatchhistory and
+    getqueuestats responses. Rows are upserted, so responses can be added any number of times, and aggregate queries
+    (win rate per god, recent KDA, head-to-head) are answered locally without any query.
+
+    Players are given either as a player id (int) or as a player name (str, case insensitive).
+    """
+    def __init__(self, path):
+        if sqlite3 is None:
+            raise ImportError('sqlite3 is not available')
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def add_match_details(self, rows):
+        """
+        :param rows: Player rows of one or more matches, as returned by getmatchdetails / getmatchdetailsbatch
+        """
+        matches = {}
+        player_matches = []
+        for row in rows:
+            if row.get('Match') is None or row.get('ret_msg'):
+                continue
+            match_id = _int(row['Match'])
+            win = row.get('Win_Status') == 'Winner'
+            task_force = _int(row.get('TaskForce'))
+            matches.setdefault(match_id, (match_id, _int(row.get('match_queue_id')), row.get('Entry_Datetime'),
+                                          _int(row.get('Minutes')), None))
+            if win:
+                matches[match_id] = matches[match_id][:4] + (task_force,)
+            player_matches.append(self._player_match(
+                match_id, row.get('playerId'), row.get('playerName'), row.get('match_queue_id'),
+                row.get('Reference_Name'), row.get('GodId'), task_force, win, row.get('Kills_Player'),
+                row.get('Deaths'), row.get('Assists'), row.get('Minutes')))
+        with self.lock:
+            self.connection.executemany('INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?)', matches.values())
+            self._insert_player_matches(player_matches)
+            self.connection.commit()
+
+    def add_match_history(self, rows):
+        """
+        :param rows: Rows of a single player's getmatchhistory response
+        """
+        player_matches = []
+        for row in rows:
+            if _int(row.get('Match')) == 0 or row.get('ret_msg'):
+                continue
+            player_matches.append(self._player_match(
+                row['Match'], row.get('playerId'), row.get('playerName'), row.get('Match_Queue_Id'), row.get('God'),
+                row.get('GodId'), row.get('TaskForce'), row.get('Win_Status') == 'Win', row.get('Kills'),
+                row.get('Deaths'), row.get('Assists'), row.get('Minutes')))
+        with self.lock:
+            self._insert_player_matches(player_matches)
+            self.connection.commit()
+
+    def add_queue_stats(self, player, queue, rows):
+        """
+        :param player: Player name or id the stats were requested for
+        :param queue: Queue id the stats were requested for
+        :param rows: Rows of the getqueuestats response
+        """
+        stats = [(str(player).lower(), queue, row.get('God'), _int(row.get('Matches')), _int(row.get('Wins')),
+                  _int(row.get('Losses')), _int(row.get('Kills')), _int(row.get('Deaths')), _int(row.get('Assists')))
+                 for row in rows if row.get('God') and not row.get('ret_msg')]
+        with self.lock:
+            self.connection.executemany('INSERT OR REPLACE INTO queue_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', stats)
+            self.connection.commit()
+
+    def god_win_rates(self, player, queue=None):
+        """
+        :return: List of (god, games, wins, win rate) ordered by games played
+        """
+        where, args = self._filter(player, queue)
+        rows = self._query('SELECT god, COUNT(*), SUM(win) FROM player_matches WHERE ' + where +
+                           ' GROUP BY god ORDER BY COUNT(*) DESC, god', args)
+        return [(god, games, wins, float(wins) / games) for god, games, wins in rows]
+
+    def recent_summary(self, player, count=20, queue=None):
+        """
+        Summary of a player's last `count` matches: games, wins, losses, kills, deaths, assists and KDA
+        ((kills + assists / 2) / deaths, as shown in game).
+        """
+        where, args = self._filter(player, queue)
+        rows = self._query('SELECT COUNT(*), SUM(win), SUM(kills), SUM(deaths), SUM(assists) FROM ('
+                           'SELECT win, kills, deaths, assists FROM player_matches WHERE ' + where +
+                           ' ORDER BY match_id DESC LIMIT ?)', args + [count])
+        games, wins, kills, deaths, assists = [value or 0 for value in rows[0]]
+        return {
+            'games': games,
+            'wins': wins,
+            'losses': games - wins,
+            'kills': kills,
+            'deaths': deaths,
+            'assists': assists,
+            'kda': (kills + assists / 2.0) / max(1, deaths)
+        }
+
+    def head_to_head(self, player, opponent, queue=None):
+        """
+        Record of `player` against `opponent` in matches where they were on opposing teams.
+
+        :return: Tuple (games, wins of player)
+        """
+        where, args = self._filter(player, queue, 'a')
+        opponent_where, opponent_args = self._filter(opponent, None, 'b')
+        rows = self._query('SELECT COUNT(*), SUM(a.win) FROM player_matches a JOIN player_matches b '
+                           'ON a.match_id = b.match_id AND a.task_force != b.task_force WHERE ' + where +
+                           ' AND ' + opponent_where, args + opponent_args)
+        return rows[0][0] or 0, rows[0][1] or 0
+
+    def _query(self, sql, args):
+        with self.lock:
+            return self.connection.execute(sql, args).fetchall()
+
+    def _insert_player_matches(self, player_matches):
+        self.connection.executemany('INSERT OR REPLACE INTO player_matches VALUES '
+                                    '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', player_matches)
+
+    @staticmethod
+    def _player_match(match_id, player_id, player_name, queue, god, god_id, task_force, win, kills, deaths,
+                      assists, minutes):
+        name = player_name or ''
+        return (_int(match_id), _int(player_id), name.lower(), name, _int(queue), god, _int(god_id),
+                _int(task_force), 1 if win else 0, _int(kills), _int(deaths), _int(assists), _int(minutes))
+
+    @staticmethod
+    def _filter(player, queue, table=None):
+        prefix = table + '.' if table else ''
+        if isinstance(player, int):
+            where, args = prefix + 'player_id = ?', [player]
+        else:
+            where, args = prefix + 'name_key = ?', [str(player).lower()]
+        if queue is not None:
+            where += ' AND ' + prefix + 'queue = ?'
+            args.append(queue)
+        return where, args
@@ -4,17 +4,41 @@
 import os
 import sys
 import json
+import time
 import random
 sys.path.append(os.path.dirname(__file__))
 
 import clr
 clr.AddReference("IronPython.Modules.dll")
+try:
+    clr.AddReference("IronPython.SQLite.dll")
+except Exception:
+    pass
 
 #   Import Smite API
 from Smite_Api import SmiteClient
 from Smite_Api import Division
 from Smite_Api import Portal
 from Smite_Api import Queue
+from Smite_Api import QuotaExceededError
+from Smite_Api import ApiUnavailableError
+from Smite_Api import PRIORITY_NORMAL
+from Smite_Api import PRIORITY_LOW
+#   Import the local match store
+from Smite_MatchStore import MatchStore
+#   Import leaderboard snapshots
+from Smite_Leaderboard import LeaderboardStore
+from Smite_Leaderboard import league_board
+#   Import the live match tracker
+from Smite_LiveMatch import LiveMatchTracker
+from Smite_LiveMatch import EVENT_MATCH_STARTED
+from Smite_LiveMatch import STATUS_IN_GAME
+#   Import the command worker pool
+from Worker_Module import WorkerPool
+from Worker_Module import RefreshScheduler
+#   Import command cooldowns
+from Cooldown_Module import CommandCooldowns
+from Cooldown_Module import ReplyCache
 #   Import your Settings class
 from Settings_Module import MySettings
 #---------------------------
@@ -22,7 +46,7 @@ from Settings_Module import MySettings
 #---------------------------
 ScriptName = 'Smite API'
 Website = ''
-Description = '!duelrank <player> and !godrank <player> <god> (add your smite dev id and auth key from the settings UI)'
+Description = '!duelrank <player>, !lastduels <player>, !match <player> and !godrank <player> <god> (add your smite dev id and auth key from the settings UI)'
 Creator = 'Enchom'
 Version = '1.0.0.2'
 
@@ -32,12 +56,24 @@ Version = '1.0.0.2'
 SettingsFile = ""
 ScriptSettings = None
 SmiteApi = None
+Workers = None
+Scheduler = None
+Cooldowns = None
+Replies = None
+Matches = None
+Leaderboards = None
+Tracker = None
+ScriptEnabled = True
+MetricsFile = os.path.join(os.path.dirname(__file__), 'Logs', 'metrics.json')
+MetricsDumpedAt = 0
+PlayerIndexSaving = False
 
 #---------------------------
 #   [Required] Initialize Data (Only called on load)
 #---------------------------
 def Init():
-    global SettingsFile, ScriptSettings, SmiteApi
+    global SettingsFile, ScriptSettings, SmiteApi, Workers, Scheduler, Cooldowns, Replies, Matches, Leaderboards, \
+        Tracker, MetricsDumpedAt
     #   Create Settings Directory
     directory = os.path.join(os.path.dirname(__file__), 'Settings')
     if not os.path.exists(directory):
@@ -47,11 +83,94 @@ def Init():
     SettingsFile = os.path.join(os.path.dirname(__file__), 'Settings', 'settings.json')
     ScriptSettings = MySettings(SettingsFile)
 
-    #   Smite API
-    SmiteApi = SmiteClient(ScriptSettings.DevId, ScriptSettings.AuthKey, lambda x: Parent.Log(ScriptName, str(x)))
+    #   Smite API (static game data is loaded from disk, no queries are made here)
+    StaticDataDirectory = os.path.join(os.path.dirname(__file__), 'Cache', 'static_data')
+    Matches = OpenStore(MatchStore, 'matches.db')
+    Leaderboards = OpenStore(LeaderboardStore, 'leaderboards.db')
+    PlayerIndexFile = os.path.join(os.path.dirname(__file__), 'Cache', 'players.json')
+    SmiteApi = SmiteClient(Parent, ScriptSettings.DevId, ScriptSettings.AuthKey,
+                           lambda x: Parent.Log(ScriptName, str(x)), StaticDataDirectory, match_store=Matches,
+                           player_index_path=PlayerIndexFile)
+    SmiteApi.quota.set_limits(ScriptSettings.DailyQueryBudget, ScriptSettings.QueriesPerMinute)
+
+    #   Command workers
+    Workers = CreateWorkers()
+    MetricsDumpedAt = time.time()
+
+    #   Background refresh of the streamer's own data and live status of the tracked players
+    Tracker = LiveMatchTracker(SmiteApi, Workers, TrackedPlayers(), logger=lambda x: Parent.Log(ScriptName, str(x)))
+    Scheduler = RefreshScheduler(Workers, logger=lambda x: Parent.Log(ScriptName, str(x)))
+    ScheduleRefreshes()
+    ScheduleLeaderboards()
+
+    #   Cooldowns and recent replies
+    Cooldowns = CommandCooldowns(ScriptSettings.UserCooldown, ScriptSettings.GlobalCooldown)
+    Replies = ReplyCache(ScriptSettings.ReplyCacheDuration)
 
     return
 
+# Matches seen in any response and leaderboard snapshots are kept in local databases, so match stats and rank
+# movement are answered without extra queries
+def OpenStore(store_class, file_name):
+    directory = os.path.join(os.path.dirname(__file__), 'Cache')
+    try:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        return store_class(os.path.join(directory, file_name))
+    except Exception as e:
+        Parent.Log(ScriptName, '{0} unavailable: {1}'.format(store_class.__name__, e))
+        return None
+
+def CreateWorkers(replies=None):
+    return WorkerPool(ScriptSettings.WorkerCount, ScriptSettings.MaxQueuedCommands,
+                      lambda x: Parent.Log(ScriptName, str(x)), replies)
+
+def ScheduleRefreshes():
+    streamer = ScriptSettings.StreamerName.lower()
+    Scheduler.clear()
+    if not streamer:
+        return
+    Scheduler.schedule('player', RefreshData, ScriptSettings.PlayerRefreshInterval,
+                       SmiteApi.get_player, streamer, ScriptSettings.PlayerRefreshInterval)
+    Scheduler.schedule('godranks', RefreshData, ScriptSettings.GodRanksRefreshInterval,
+                       SmiteApi.get_god_rank_index, streamer, ScriptSettings.GodRanksRefreshInterval)
+    # The live match tracker already keeps the status of tracked players fresh
+    if streamer not in TrackedPlayers():
+        Scheduler.schedule('status', RefreshData, ScriptSettings.StatusRefreshInterval,
+                           SmiteApi.get_player_status, streamer, ScriptSettings.StatusRefreshInterval)
+
+# Players followed by the live match tracker, the streamer if none are set
+def TrackedPlayers():
+    players = [player.strip().lower() for player in ScriptSettings.TrackedPlayers.split(',') if player.strip()]
+    if len(players) == 0 and ScriptSettings.StreamerName:
+        players = [ScriptSettings.StreamerName.lower()]
+    return players
+
+def ScheduleLeaderboards():
+    if Leaderboards is None:
+        return
+    Scheduler.schedule('leaderboard', RefreshLeaderboard, ScriptSettings.LeaderboardRefreshInterval,
+                       Queue.DUEL, ScriptSettings.LeaderboardTier, ScriptSettings.LeaderboardRound)
+
+# Refreshed data stays cached for two intervals, so commands keep being served from warm data if a refresh is late
+def RefreshData(request, player, interval):
+    with SmiteApi.priority(PRIORITY_LOW), SmiteApi.refresh(2 * interval):
+        request(player)
+
+# Leaderboard snapshots are taken at low priority, so they are the first to stop when the daily budget runs low
+def RefreshLeaderboard(queue, tier, round):
+    with SmiteApi.priority(PRIORITY_LOW):
+        rows = SmiteApi.get_league_leaderboard(queue, tier, round)
+    Leaderboards.add_snapshot(league_board(queue, tier, round), rows)
+
+# Submitted from Tick() while the player index has unsaved changes, at most one save is queued at a time
+def SavePlayerIndex():
+    global PlayerIndexSaving
+    try:
+        SmiteApi.player_index.save()
+    finally:
+        PlayerIndexSaving = False
+
 #---------------------------
 #   [Required] Execute Data / Process messages
 #---------------------------
@@ -59,95 +178,330 @@ def Execute(data):
     if data.IsChatMessage():
         words = list(map(lambda x: x.lower(), data.Message.split(' ')))
 
-        # !godrank <player> <god> returns stats about
-        if words[0] == '!godrank':
-            if len(words) < 3:
-                Parent.SendStreamMessage('Usage: !godrank <player> <god>')
-                return
-
-            player = words[1]
-            god = ' '.join(words[2:])
-
-            player_found = True
-            try:
-                ranks = SmiteApi.get_god_ranks(player)
-                if len(ranks) == 0:
-                    player_found = False
-            except:
-                player_found = False
-
-            if not player_found:
-                Parent.SendStreamMessage('Could not find player ' + str(player))
-                return
-
-            god_rank = None
-            for rank in ranks:
-                if rank['god'].lower() == god.lower():
-                    god_rank = rank
-            if god_rank is None:
-                Parent.SendStreamMessage('Could not find god ' + str(god))
-                return
-
-            response = 'Player {0} on {1} stats: '.format(player, god) + \
-                       'Worshippers: {0} | Win/Loss: {1}/{2} | Kills/Deaths: {3}/{4}'\
-                            .format(god_rank['Worshippers'], god_rank['Wins'], god_rank['Losses'],
-                                   god_rank['Kills'], god_rank['Deaths'])
-            Parent.SendStreamMessage(response)
-        # !duelrank <player> returns current duel rank for a given player (with default player Enchom)
-        elif words[0] == '!duelrank':
-            if len(words) < 2:
-                player = 'Enchom'  # Default
-            else:
-                player = words[1]
-
-            player_found = True
-            try:
-                player_data = SmiteApi.get_player(player)
-                if len(player_data) == 0:
-                    player_found = False
-                else:
-                    player_data = player_data[0]
-            except:
-                player_found = False
-
-            if not player_found:
-                Parent.SendStreamMessage('Could not find player ' + str(player))
-                return
-
-            rank = Division.get_name(player_data['RankedDuel']['Tier']).replace('_', ' ')
-            Parent.SendStreamMessage('Player {0} is in {1}'.format(player, rank))
-        elif words[0] == '!quota':
-            try:
-                quota = SmiteApi.get_data_used()[0]
-            except:
-                Parent.SendStreamMessage('Could not fetch quotas')
-                return
-            requests_left = quota['Request_Limit_Daily'] - quota['Total_Requests_Today']
-            Parent.SendStreamMessage('{} queries left for today'.format(requests_left))
+        command = words[0]
+        if command not in InstantCommandHandlers and command not in CommandHandlers:
+            return
+        if command in ModCommands and not Parent.HasPermission(data.User, 'Moderator', ''):
+            return
+        if Cooldowns.is_user_on_cooldown(command, data.User):
+            return
+
+        # Instant commands do not touch the Smite API and are answered right away
+        handler = InstantCommandHandlers.get(command)
+        if handler is not None:
+            Cooldowns.add_user_cooldown(command, data.User)
+            Parent.SendStreamMessage(handler(words))
+            return
+
+        # Identical queries are answered from the recent replies, or ignored if chat has just seen the answer
+        key = ReplyCache.make_key(words)
+        reply, suppress = Replies.get(key)
+        if reply is not None:
+            Cooldowns.add_user_cooldown(command, data.User)
+            if not suppress:
+                Parent.SendStreamMessage(reply)
+            return
+        if Cooldowns.is_global_on_cooldown(command):
+            return
+
+        # Commands are answered from a worker thread, the reply is sent on a later Tick()
+        priority = CommandPriorities.get(command, PRIORITY_NORMAL)
+        if not Workers.submit(RunCommand, CommandHandlers[command], priority, words, key):
+            Parent.Log(ScriptName, 'Command queue is full, dropping ' + command)
+            return
+        Cooldowns.add_user_cooldown(command, data.User)
+        Cooldowns.add_global_cooldown(command)
 
     return
 
+#---------------------------
+#   Command handlers (run on worker threads, return the reply to send)
+#---------------------------
+def RunCommand(handler, priority, words, key):
+    SmiteApi.pop_stale_age()
+    try:
+        with SmiteApi.priority(priority):
+            reply = handler(words)
+    except QuotaExceededError:
+        return 'Smite API query budget reached, try again later'
+    except ApiUnavailableError:
+        return 'Smite API is unavailable right now, try again later'
+
+    # Data served from the cache while the API is down is marked with its age
+    stale_age = SmiteApi.pop_stale_age()
+    if stale_age is not None and reply is not None:
+        reply += ' (as of {0} min ago, Smite API unavailable)'.format(int(stale_age // 60))
+    elif reply is not None:
+        Replies.put(key, reply)
+    return reply
+
+# !godrank <player> <god> returns stats about
+def GodRank(words):
+    if len(words) < 3:
+        return 'Usage: !godrank <player> <god>'
+
+    player = words[1]
+    god = ' '.join(words[2:])
+
+    try:
+        god_name, suggestions = SmiteApi.find_god(god)
+    except QuotaExceededError:
+        raise
+    except:
+        god_name, suggestions = god, []
+    if god_name is None:
+        if len(suggestions) == 0:
+            return 'Could not find god ' + str(god)
+        return 'Could not find god {0}, did you mean {1}?'.format(god, ' / '.join(suggestions))
+
+    player_found = True
+    try:
+        ranks = SmiteApi.get_god_rank_index(player)
+        if len(ranks) == 0:
+            player_found = False
+    except (QuotaExceededError, ApiUnavailableError):
+        raise
+    except:
+        player_found = False
+
+    if not player_found:
+        return 'Could not find player ' + str(player)
+
+    god_rank = SmiteApi.get_god_rank(player, god_name, ranks)
+    if god_rank is None:
+        return 'Player {0} has no stats on {1}'.format(player, god_name)
+
+    return 'Player {0} on {1} stats: '.format(player, god_name) + \
+           'Worshippers: {0} | Win/Loss: {1}/{2} | Kills/Deaths: {3}/{4}'\
+                .format(god_rank['Worshippers'], god_rank['Wins'], god_rank['Losses'],
+                       god_rank['Kills'], god_rank['Deaths'])
+
+# !duelrank <player> returns current duel rank for a given player (with the streamer as default player)
+def DuelRank(words):
+    if len(words) < 2:
+        player = ScriptSettings.StreamerName.lower()  # Default
+    else:
+        player = words[1]
+
+    player_found = True
+    try:
+        player_data = SmiteApi.get_player(player)
+        if len(player_data) == 0:
+            player_found = False
+        else:
+            player_data = player_data[0]
+    except (QuotaExceededError, ApiUnavailableError):
+        raise
+    except:
+        player_found = False
+
+    if not player_found:
+        return 'Could not find player ' + str(player)
+
+    rank = Division.get_name(player_data['RankedDuel']['Tier']).replace('_', ' ')
+    return 'Player {0} is in {1}'.format(player, rank)
+
+# !lastduels <player> returns the record and KDA of the last duels of a player (with the streamer as default player)
+def LastDuels(words):
+    if len(words) < 2:
+        player = ScriptSettings.StreamerName.lower()  # Default
+    else:
+        player = words[1]
+
+    if Matches is None:
+        return 'Match history is not available'
+
+    # The latest matches are saved to the match store as part of the request
+    SmiteApi.get_match_history(player)
+    summary = Matches.recent_summary(player, RecentDuelCount, Queue.DUEL)
+    if summary['games'] == 0:
+        return 'No recent duels found for player ' + str(player)
+
+    return 'Last {0} duels of {1}: {2}W/{3}L | K/D/A {4}/{5}/{6} (KDA {7:.2f})'.format(
+        summary['games'], player, summary['wins'], summary['losses'],
+        summary['kills'], summary['deaths'], summary['assists'], summary['kda'])
+
+# !clanranks <clan> returns the best duel ranks among the members of a clan (clan id, name or tag)
+def ClanRanks(words):
+    clan = ' '.join(word for word in words[1:] if word)
+    if not clan:
+        return 'Usage: !clanranks <clan>'
+
+    clan_id, clan_name = clan, clan
+    if not clan.isdigit():
+        teams = SmiteApi.search_teams(clan)
+        exact = [team for team in teams if clan in (str(team.get('Name')).lower(), str(team.get('Tag')).lower())]
+        if len(teams) == 0:
+            return 'Could not find clan ' + clan
+        team = (exact or teams)[0]
+        clan_id, clan_name = team['TeamId'], team['Name']
+
+    # Members are requested in parallel, see SmiteClient.get_players
+    members = 0
+    ranked = []
+    for member, player_data in SmiteApi.get_team_player_records(clan_id):
+        members += 1
+        if len(player_data) == 0:
+            continue
+        duel = player_data[0].get('RankedDuel') or {}
+        if duel.get('Tier'):
+            ranked.append((duel['Tier'], duel.get('Points', 0), player_data[0].get('hz_player_name') or member))
+    if len(ranked) == 0:
+        return 'No ranked duel players in clan ' + str(clan_name)
+
+    ranked.sort(reverse=True)
+    return 'Top duel ranks in {0}: {1} | {2} of {3} members ranked'.format(
+        clan_name, ', '.join('{0} ({1})'.format(name, Division.get_name(tier).replace('_', ' '))
+                             for tier, points, name in ranked[:ClanRankCount]), len(ranked), members)
+
+# !quota returns the number of queries left for today (tracked locally, no query is spent)
+def QuotaLeft(words):
+    return '{} queries left for today'.format(SmiteApi.quota.remaining())
+
+# !match <player> returns the live match of a tracked player (answered from the tracked state, no query is spent)
+def LiveMatch(words):
+    if len(words) < 2 or not words[1]:
+        player = ScriptSettings.StreamerName.lower()  # Default
+    else:
+        player = words[1]
+
+    state = Tracker.get(player)
+    if state is None:
+        return 'Player {0} is not tracked'.format(player)
+    if state['status'] is None:
+        return 'Status of {0} is not known yet'.format(player)
+    if state['status'] != STATUS_IN_GAME:
+        return 'Player {0} is {1}'.format(player, StatusDescriptions.get(state['status'], 'not found'))
+
+    queue = (Queue.get_name(state['queue']) or 'MATCH').replace('_', ' ').title()
+    reply = 'Player {0} is in {1} for {2} min'.format(player, queue, int((Tracker.clock() - state['since']) // 60))
+    if state['lobby']:
+        teams = {}
+        for row in state['lobby']:
+            teams.setdefault(row.get('taskForce'), []).append(
+                '{0} ({1})'.format(row.get('playerName') or 'Hidden', row.get('ChampionName')))
+        reply += ': ' + ' vs '.join(', '.join(teams[team]) for team in sorted(teams))
+    return reply
+
+# !climbers returns the biggest climbers of the tracked duel leaderboard since midnight (answered from snapshots)
+def Climbers(words):
+    if Leaderboards is None:
+        return 'Leaderboard tracking is not available'
+    midnight = time.mktime(time.localtime()[:3] + (0, 0, 0, 0, 0, -1))
+    board = league_board(Queue.DUEL, ScriptSettings.LeaderboardTier, ScriptSettings.LeaderboardRound)
+    climbers = [climber for climber in Leaderboards.movement(board, midnight, ClimberCount) if climber['climbed'] > 0]
+    if len(climbers) == 0:
+        return 'No duel leaderboard climbers today'
+    return 'Biggest duel climbers today: ' + ' | '.join(
+        '{0} +{1} (#{2} -> #{3}, {4:+d} TP)'.format(climber['name'], climber['climbed'], climber['old_position'],
+                                                   climber['position'], climber['points_gained'])
+        for climber in climbers)
+
+# !smitestats returns the slowest Smite API methods (mods only)
+def SmiteStats(words):
+    methods = SmiteApi.metrics.snapshot()
+    if len(methods) == 0:
+        return 'No Smite API calls made yet'
+    ranked = sorted(methods.items(), key=lambda item: -item[1]['timings']['total']['mean_ms'] * item[1]['calls'])
+    stats = []
+    for method, summary in ranked[:StatsMethodCount]:
+        total = summary['timings']['total']
+        lookups = summary['cache_hits'] + summary['cache_misses']
+        stats.append('{0}: {1} calls, p50 {2:.0f}ms, p99 {3:.0f}ms, {4} errors, {5:.0f}% cached'.format(
+            method, summary['calls'], total['p50_ms'], total['p99_ms'], summary['errors'],
+            100.0 * summary['cache_hits'] / lookups if lookups > 0 else 0))
+    return ' | '.join(stats)
+
+CommandHandlers = {
+    '!godrank': GodRank,
+    '!duelrank': DuelRank,
+    '!lastduels': LastDuels,
+    '!clanranks': ClanRanks
+}
+
+InstantCommandHandlers = {
+    '!quota': QuotaLeft,
+    '!smitestats': SmiteStats,
+    '!climbers': Climbers,
+    '!match': LiveMatch
+}
+
+ModCommands = set(['!smitestats'])
+StatsMethodCount = 4
+RecentDuelCount = 20
+ClanRankCount = 5
+ClimberCount = 3
+StatusDescriptions = {0: 'offline', 1: 'in the lobby', 2: 'selecting a god', 4: 'online', 5: 'not found'}
+
+# Low priority commands are refused first as the daily query budget runs out
+CommandPriorities = {
+    '!godrank': PRIORITY_LOW,
+    '!duelrank': PRIORITY_NORMAL,
+    '!lastduels': PRIORITY_NORMAL,
+    '!clanranks': PRIORITY_LOW
+}
+
 #---------------------------
 #   [Required] Tick method (Gets called during every iteration even when there is no incoming data)
 #---------------------------
 def Tick():
+    global MetricsDumpedAt, PlayerIndexSaving
+    for reply in Workers.drain_replies():
+        Parent.SendStreamMessage(reply)
+
+    if ScriptEnabled:
+        Scheduler.tick()
+        Tracker.tick()
+
+    for event, player, state in Tracker.drain_events():
+        Parent.Log(ScriptName, '{0}: {1} ({2})'.format(event, player, state['status_string']))
+        if event == EVENT_MATCH_STARTED and ScriptSettings.AnnounceMatches:
+            Parent.SendStreamMessage(LiveMatch(['!match', player]))
+
+    if ScriptSettings.MetricsDumpInterval > 0 and time.time() - MetricsDumpedAt >= ScriptSettings.MetricsDumpInterval:
+        MetricsDumpedAt = time.time()
+        try:
+            SmiteApi.metrics.dump(MetricsFile)
+        except Exception as e:
+            Parent.Log(ScriptName, 'Could not write metrics: ' + str(e))
+
+    # Saved on a worker, so neither commands nor the chatbot thread wait for the file to be written
+    if not PlayerIndexSaving and SmiteApi.player_index.needs_save():
+        PlayerIndexSaving = True
+        if not Workers.submit(SavePlayerIndex):
+            PlayerIndexSaving = False
     return
 
 #---------------------------
 #   [Optional] Reload Settings (Called when a user clicks the Save Settings button in the Chatbot UI)
 #---------------------------
 def ReloadSettings(json_data):
-    global ScriptSettings, SmiteApi
+    global ScriptSettings, SmiteApi, Workers
     json_data = json.loads(json_data)
+    worker_settings = (ScriptSettings.WorkerCount, ScriptSettings.MaxQueuedCommands)
     ScriptSettings.reload(json_data)
     SmiteApi.set_auth_key(ScriptSettings.AuthKey)
     SmiteApi.set_dev_id(ScriptSettings.DevId)
+    SmiteApi.quota.set_limits(ScriptSettings.DailyQueryBudget, ScriptSettings.QueriesPerMinute)
+
+    if worker_settings != (ScriptSettings.WorkerCount, ScriptSettings.MaxQueuedCommands):
+        # The stopped pool still runs its queued jobs, their replies go to the reply queue the new pool takes over
+        Workers.stop()
+        Workers = CreateWorkers(Workers.replies)
+        Scheduler.workers = Workers
+        Tracker.workers = Workers
+    Tracker.set_players(TrackedPlayers())
+    ScheduleRefreshes()
+    ScheduleLeaderboards()
+    Cooldowns.set_durations(ScriptSettings.UserCooldown, ScriptSettings.GlobalCooldown)
+    Replies.duration = ScriptSettings.ReplyCacheDuration
 
     ui_path = os.path.join(os.path.dirname(__file__), 'UI_Config.json')
     with open(ui_path, 'r') as f:
         json_ui = json.load(f)
-    json_ui['DevId']['value'] = json_data['DevId']
-    json_ui['AuthKey']['value'] = json_data['AuthKey']
+    for key in json_data:
+        if key in json_ui:
+            json_ui[key]['value'] = json_data[key]
     with open(ui_path, 'w') as f:
         f.write(json.dumps(json_ui, indent=4, sort_keys=True))
 
@@ -157,10 +511,20 @@ def ReloadSettings(json_data):
 #   [Optional] Unload (Called when a user reloads their scripts or closes the bot / cleanup stuff)
 #---------------------------
 def Unload():
+    if Workers is not None:
+        Workers.stop()
+    if SmiteApi is not None:
+        SmiteApi.player_index.save()
+    if Matches is not None:
+        Matches.close()
+    if Leaderboards is not None:
+        Leaderboards.close()
     return
 
 #---------------------------
 #   [Optional] ScriptToggled (Notifies you when a user disables your script or enables it)
 #---------------------------
 def ScriptToggled(state):
+    global ScriptEnabled
+    ScriptEnabled = state
     return
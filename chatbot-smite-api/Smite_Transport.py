@@ -0,0 +1,164 @@
+import re
+import json
+import threading
+
+try:
+    import httplib
+    from urlparse import urlparse
+    import Queue as queue
+except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlparse
+    import queue
+
+_RESPONSE_KEY = re.compile(r'"response"\s*:\s*"')
+
+HTTP_POOL_SIZE = 4
+HTTP_TIMEOUT = 10
+
+
+def _extract_response(raw):
+    """
+    Returns the inner response text of a Parent.GetRequest result without building the wrapper object.
+    """
+    match = _RESPONSE_KEY.search(raw)
+    if match is None:
+        return json.loads(raw)['response']
+    return json.decoder.scanstring(raw, match.end())[0]
+
+
+class ParentTransport(object):
+    """
+    Sends requests through the chatbot's Parent.GetRequest.
+    """
+    def __init__(self, Parent):
+        self.Parent = Parent
+
+    def get(self, url, headers):
+        """
+        :return: Response body text
+        """
+        return _extract_response(self.Parent.GetRequest(url, headers))
+
+
+class HttpTransport(object):
+    """
+    Sends requests directly over HTTP, for use outside the chatbot (crawlers, backfills). Connections are kept alive
+    and reused from a pool of up to pool_size connections per host, so requests do not pay for a new TCP connection.
+    """
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pools = {}
+
+    def get(self, url, headers):
+        parsed = urlparse(url)
+        path = parsed.path + ('?' + parsed.query if parsed.query else '')
+        request_headers = dict(headers)
+        request_headers['Connection'] = 'keep-alive'
+        pool = self._get_pool(parsed.scheme, parsed.netloc)
+
+        # A kept-alive connection may have been closed by the server in the meantime, retry once on a new one. A new
+        # connection is not retried, so a timeout during an outage is not waited for twice
+        for attempt in range(2):
+            connection, pooled = self._acquire(pool, parsed.scheme, parsed.netloc, fresh=attempt > 0)
+            try:
+                connection.request('GET', path, headers=request_headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (httplib.HTTPException, IOError):
+                connection.close()
+                if not pooled:
+                    raise
+                continue
+            if response.getheader('connection', '').lower() == 'close':
+                connection.close()
+            else:
+                self._release(pool, connection)
+            if response.status != 200:
+                raise IOError('HTTP {0} for {1}'.format(response.status, url))
+            return body.decode('utf-8')
+
+    def close(self):
+        with self.lock:
+            pools = list(self.pools.values())
+            self.pools = {}
+        for pool in pools:
+            while not pool.empty():
+                pool.get_nowait().close()
+
+    def _get_pool(self, scheme, host):
+        with self.lock:
+            pool = self.pools.get((scheme, host))
+            if pool is None:
+                pool = queue.LifoQueue(self.pool_size)
+                self.pools[(scheme, host)] = pool
+            return pool
+
+    def _acquire(self, pool, scheme, host, fresh=False):
+        """
+        :return: Tuple (connection, True if it was taken from the pool)
+        """
+        if not fresh:
+            try:
+                return pool.get_nowait(), True
+            except queue.Empty:
+                pass
+        if scheme == 'https':
+            return httplib.HTTPSConnection(host, timeout=self.timeout), False
+        return httplib.HTTPConnection(host, timeout=self.timeout), False
+
+    def _release(self, pool, connection):
+        try:
+            pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+
+class RecordReplayTransport(object):
+    """
+    Records responses of another transport to a JSON file, or replays them offline when no transport is given.
+    Requests are matched on the API method and its parameters, ignoring the signature, session and timestamp.
+    """
+    def __init__(self, path, transport=None):
+        """
+        :param path: Recording file
+        :param transport: (optional) Transport to record. If omitted, responses are replayed from the file
+        """
+        self.path = path
+        self.transport = transport
+        self.lock = threading.Lock()
+        self.recordings = {}
+        try:
+            with open(path, 'r') as f:
+                self.recordings = json.load(f)
+        except (IOError, ValueError):
+            if transport is None:
+                raise
+
+    @staticmethod
+    def make_key(url):
+        parts = urlparse(url).path.split('/')
+        for i, part in enumerate(parts):
+            if part.endswith('json'):
+                # {method}json/{dev_id}/{signature}/{session}/{timestamp}/{params...}
+                if part in ('pingjson', 'createsessionjson'):
+                    return part
+                return '/'.join([part] + parts[i + 5:])
+        return url
+
+    def get(self, url, headers):
+        key = RecordReplayTransport.make_key(url)
+        if self.transport is None:
+            try:
+                return self.recordings[key]
+            except KeyError:
+                raise IOError('No recorded response for ' + key)
+
+        body = self.transport.get(url, headers)
+        with self.lock:
+            self.recordings[key] = body
+            with open(self.path, 'w') as f:
+                json.dump(self.recordings, f, indent=2, sort_keys=True)
+        return body
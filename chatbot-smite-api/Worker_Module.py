@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import deque
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+
+class WorkerPool(object):
+    """
+    Runs chat command jobs on background threads so Execute() never waits on the Hi-Rez API. Every job returns the
+    reply to send (or None) and replies are collected until the chatbot thread drains them from Tick().
+    """
+    def __init__(self, worker_count=2, max_queue_size=20, logger=lambda x: None, replies=None):
+        """
+        :param replies: (optional) Reply queue to share, e.g. the one of a pool this pool replaces, so replies of jobs
+        the stopped pool still runs are drained from the new pool
+        """
+        self.worker_count = max(1, int(worker_count))
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.logger = logger
+        self.jobs = queue.Queue(self.max_queue_size)
+        self.replies = replies if replies is not None else deque()
+        self.workers = []
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._run, name='SmiteWorker-{0}'.format(i))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, job, *args):
+        """
+        Queues a job for execution.
+
+        :return: False if the queue is full and the job was dropped
+        """
+        try:
+            self.jobs.put_nowait((job, args))
+        except queue.Full:
+            return False
+        return True
+
+    def drain_replies(self):
+        """
+        Returns all replies produced since the last call. Safe to call on every Tick().
+        """
+        replies = []
+        while self.replies:
+            replies.append(self.replies.popleft())
+        return replies
+
+    def pending(self):
+        return self.jobs.qsize()
+
+    def stop(self):
+        for _ in self.workers:
+            try:
+                self.jobs.put_nowait(None)
+            except queue.Full:
+                break
+        self.workers = []
+
+    def _run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                return
+            job, args = item
+            try:
+                reply = job(*args)
+            except Exception as e:
+                self.logger('[ERROR] Command failed: ' + str(e))
+                continue
+            if reply is not None:
+                self.replies.append(reply)
+
+
+class RefreshScheduler(object):
+    """
+    Periodically submits background jobs to a WorkerPool. Driven by calling tick() (from Tick()), a job is submitted
+    once its interval has passed and it is not still running from the previous round.
+    """
+    def __init__(self, workers, clock=time.time, logger=lambda x: None):
+        self.workers = workers
+        self.clock = clock
+        self.logger = logger
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, name, job, interval, *args):
+        """
+        Adds or replaces a job. Jobs with an interval of 0 or less are removed.
+
+        :param interval: Seconds between two runs of the job
+        """
+        with self.lock:
+            if interval <= 0:
+                self.jobs.pop(name, None)
+                return
+            self.jobs[name] = {'job': job, 'args': args, 'interval': interval, 'last_run': None, 'running': False}
+
+    def clear(self):
+        with self.lock:
+            self.jobs = {}
+
+    def tick(self):
+        now = self.clock()
+        with self.lock:
+            due = [(name, entry) for name, entry in self.jobs.items()
+                   if not entry['running'] and (entry['last_run'] is None or now - entry['last_run'] >= entry['interval'])]
+        for name, entry in due:
+            entry['running'] = True
+            if self.workers.submit(self._run, name, entry):
+                entry['last_run'] = now
+            else:
+                entry['running'] = False
+
+    def _run(self, name, entry):
+        try:
+            entry['job'](*entry['args'])
+        except Exception as e:
+            self.logger('[WARNING] Background job {0} failed: {1}'.format(name, e))
+        finally:
+            entry['running'] = False